@@ -3,25 +3,13 @@
 Tool for comparing genotypes from two TR VCFs
 """
 
-# Allow making plots even with no x-forward
-import matplotlib
-
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-
-# Allow plots to be editable in Adobe Illustrator
-matplotlib.rcParams['pdf.fonttype'] = 42
-matplotlib.rcParams['ps.fonttype'] = 42
-
 import argparse
 import os
 
 # Load external libraries
-from matplotlib.lines import Line2D
 import numpy as np
-import pandas as pd
-import scipy.stats
 import sys
+import warnings
 
 import trtools.utils.common as common
 import trtools.utils.mergeutils as mergeutils
@@ -93,6 +81,26 @@ def GetFormatFields(format_fields, format_binsizes, format_fileoption, vcfreader
     return formats, bins
 
 
+def _SortedPeriods(results):
+    # The keys of a period -> results dict, in the order they are output:
+    # 'ALL' and then each period in sort order
+    return ['ALL', *sorted(key for key in results if key != 'ALL')]
+
+
+def _NewFigure():
+    # matplotlib is only imported once a plot is made,
+    # so runs with --noplot don't pay for loading it.
+    # The figure is drawn without pyplot, so no backend
+    # (and no x-forward) is needed.
+    import matplotlib
+    from matplotlib.figure import Figure
+
+    # Allow plots to be editable in Adobe Illustrator
+    matplotlib.rcParams['pdf.fonttype'] = 42
+    matplotlib.rcParams['ps.fonttype'] = 42
+    return Figure()
+
+
 def OutputLocusMetrics(locus_results, outprefix, noplot):
     r"""Output per-locus metrics
 
@@ -111,33 +119,32 @@ def OutputLocusMetrics(locus_results, outprefix, noplot):
     """
     with open(outprefix + '-locuscompare.tab', 'w') as tabfile:
         tabfile.write('chrom\tstart\tmetric-conc-seq\tmetric-conc-len\tnumcalls\n')
-        for chrom, start, metric_conc_seq, metric_conc_len, numcalls in zip(
-                locus_results['chrom'],
-                locus_results['start'],
-                locus_results['metric-conc-seq'],
-                locus_results['metric-conc-len'],
-                locus_results['numcalls']
-        ):
-            tabfile.write('{}\t{}\t{}\t{}\t{}\n'.format(
-                chrom, start, metric_conc_seq, metric_conc_len, numcalls
+        # convert each column to python values once, so formatting a row
+        # does no numpy scalar lookups, and write every row in one
+        # writelines call
+        tabfile.writelines(map(
+            '{}\t{}\t{}\t{}\t{}\n'.format,
+            *(np.asarray(locus_results[column]).tolist() for column in (
+                'chrom', 'start', 'metric-conc-seq', 'metric-conc-len', 'numcalls'
             ))
+        ))
 
     # Create per-locus plot
     if noplot: return
 
-    fig = plt.figure()
+    fig = _NewFigure()
     ax = fig.add_subplot(111)
 
     nloci = len(locus_results['chrom'])
     if nloci <= 20:
         sort_idx = np.argsort(locus_results['metric-conc-len'])[::-1]
         for key in {'chrom', 'start', 'metric-conc-len'}:
-            locus_results[key] = np.array(locus_results[key])[sort_idx]
+            locus_results[key] = np.asarray(locus_results[key])[sort_idx]
         ax.scatter(np.arange(nloci), locus_results['metric-conc-len'], color="darkblue")
         ax.set_xticks(np.arange(nloci))
         ax.set_xticklabels(
-            ["{}:{}".format(chrom, start) for chrom, start in zip(
-                locus_results['chrom'], locus_results['start']
+            [f"{chrom}:{start}" for chrom, start in zip(
+                locus_results['chrom'].tolist(), locus_results['start'].tolist()
             )], size=12, rotation=90
         )
     else:
@@ -145,9 +152,8 @@ def OutputLocusMetrics(locus_results, outprefix, noplot):
         ax.scatter(np.arange(nloci), sorted_results, color="darkblue")
         ax.set_xlabel("Successive TR Loci", size=15)
     ax.set_ylabel("Length Concordance", size=15)
-    plt.tight_layout()
+    fig.tight_layout()
     fig.savefig(outprefix + "-locuscompare.pdf")
-    plt.close()
 
 
 def OutputSampleMetrics(sample_results, sample_names, outprefix, noplot):
@@ -173,18 +179,19 @@ def OutputSampleMetrics(sample_results, sample_names, outprefix, noplot):
         sample_results['conc-len-count'] / sample_results['numcalls']
     with open(outprefix + '-samplecompare.tab', 'w') as tabfile:
         tabfile.write('sample\tmetric-conc-seq\tmetric-conc-len\tnumcalls\n')
-        for idx, sample in enumerate(sample_names):
-            tabfile.write('{}\t{}\t{}\t{}\n'.format(
-                sample,
-                sample_results['conc-seq-count'][idx],
-                sample_results['conc-len-count'][idx],
-                sample_results['numcalls'][idx]
-            ))
+        # as for the locus table, python values and one writelines call
+        tabfile.writelines(map(
+            '{}\t{}\t{}\t{}\n'.format,
+            sample_names,
+            sample_results['conc-seq-count'].tolist(),
+            sample_results['conc-len-count'].tolist(),
+            sample_results['numcalls'].tolist()
+        ))
 
     # Create per-locus plot
     if noplot: return
     nsamples = len(sample_names)
-    fig = plt.figure()
+    fig = _NewFigure()
     ax = fig.add_subplot(111)
     if nsamples <= 20:
         sort_idx = np.argsort(sample_results['conc-len-count'])[::-1]
@@ -198,9 +205,8 @@ def OutputSampleMetrics(sample_results, sample_names, outprefix, noplot):
         ax.scatter(np.arange(nsamples), sorted_results, color="darkblue")
         ax.set_xlabel("Successive samples", size=15)
     ax.set_ylabel("Length Concordance", size=15)
-    plt.tight_layout()
+    fig.tight_layout()
     fig.savefig(outprefix + "-samplecompare.pdf")
-    plt.close()
 
 
 def OutputOverallMetrics(overall_results, format_fields, format_bins, outprefix):
@@ -220,62 +226,47 @@ def OutputOverallMetrics(overall_results, format_fields, format_bins, outprefix)
     outprefix : str
         Prefix to name output file
     """
-    # get periods in sort order
-    periods = set(overall_results.keys())
-    periods.remove('ALL')
-    periods = list(periods)
-    periods.sort()
-    periods.insert(0, 'ALL')
-
-    def write_format_bin(tabfile, format_bin_results, per, fmt_idx,
-                         format_bin_string):
+    periods = _SortedPeriods(overall_results)
+
+    def format_bin_row(format_bin_results, per, fmt_idx, format_bin_string):
         numcalls = format_bin_results['numcalls']
-        if numcalls == 0:
-            return
-
-        tabfile.write(str(per))
-        tabfile.write('\t')
-        for idx in range(len(format_fields)):
-            if idx == fmt_idx:
-                tabfile.write(format_bin_string)
-                tabfile.write('\t')
-            else:
-                tabfile.write('NA\t')
-        tabfile.write('{}\t{}\t{}\t{}\n'.format(
-            format_bin_results['conc_seq_count'] / numcalls,
-            format_bin_results['conc_len_count'] / numcalls,
-            CalcR2(format_bin_results),
-            numcalls
-        ))
+        format_cols = ['NA'] * len(format_fields)
+        if fmt_idx is not None:
+            format_cols[fmt_idx] = format_bin_string
+        return '\t'.join([
+            str(per),
+            *format_cols,
+            '{}'.format(format_bin_results['conc_seq_count'] / numcalls),
+            '{}'.format(format_bin_results['conc_len_count'] / numcalls),
+            '{}'.format(CalcR2(format_bin_results)),
+            '{}'.format(numcalls)
+        ]) + '\n'
+
+    # build all the rows, then write them at once
+    rows = ['\t'.join(['period', *format_fields, 'concordance-seq',
+                       'concordance-len', 'r2', 'numcalls']) + '\n']
+    for per in periods:
+        # the entry that is not stratified across formats
+        format_bins_results = [(overall_results[per]['ALL'], None, None)]
+        # stratify across formats
+        for fmt_idx, (fmt, bins) in enumerate(zip(format_fields, format_bins)):
+            for bin_idx in range(len(bins) - 2):
+                bin_string = "[{}, {})".format(bins[bin_idx],
+                                               bins[bin_idx + 1])
+                format_bins_results.append(
+                    (overall_results[per][fmt][bins[bin_idx]], fmt_idx, bin_string))
+            bin_string = "[{}, {}]".format(bins[-2], bins[-1])
+            format_bins_results.append(
+                (overall_results[per][fmt][bins[-2]], fmt_idx, bin_string))
+
+        for format_bin_results, fmt_idx, bin_string in format_bins_results:
+            if format_bin_results['numcalls'] == 0:
+                continue
+            rows.append(format_bin_row(format_bin_results, per, fmt_idx,
+                                       bin_string))
 
     with open(outprefix + "-overall.tab", "w") as tabfile:
-        tabfile.write('period\t')
-        for fmt in format_fields:
-            tabfile.write(fmt)
-            tabfile.write('\t')
-        tabfile.write("concordance-seq\tconcordance-len\tr2\tnumcalls\n")
-
-        for per in periods:
-            # write the entry that is not stratified across formats
-            write_format_bin(tabfile, overall_results[per]['ALL'],
-                             per, None, None)
-            # stratify across formats
-            for fmt_idx, (fmt, bins) in enumerate(zip(format_fields, format_bins)):
-                for bin_idx in range(len(bins) - 2):
-                    bin_string = "[{}, {})".format(bins[bin_idx],
-                                                   bins[bin_idx + 1])
-                    write_format_bin(tabfile,
-                                     overall_results[per][fmt][bins[bin_idx]],
-                                     per,
-                                     fmt_idx,
-                                     bin_string)
-                bin_string = "[{}, {}]".format(bins[-2],
-                                               bins[-1])
-                write_format_bin(tabfile,
-                                 overall_results[per][fmt][bins[-2]],
-                                 per,
-                                 fmt_idx,
-                                 bin_string)
+        tabfile.write(''.join(rows))
 
 
 def GetBubbleLegend(coordinate_counts):
@@ -286,17 +277,20 @@ def GetBubbleLegend(coordinate_counts):
     Parameters
     ----------
     coordinate_counts :
-        set of counts for coordinates in the graph
+        set or array of counts for coordinates in the graph.
+        Repeated counts are only considered once
 
     Returns
     -------
     legend_values : list of int
         List of three or fewer representative sample sizes to use for bubble legend
     """
-    if len(coordinate_counts) <= 3: return list(coordinate_counts)  # if only three values, return three of them
+    # list() first, as np.unique would treat a set as a single object
+    coordinate_counts = np.unique(list(coordinate_counts))
+    if coordinate_counts.size <= 3: return coordinate_counts.tolist()  # if only three values, return three of them
     # Determine if we do log10 or linear scale
-    minval = min(coordinate_counts)
-    maxval = max(coordinate_counts)
+    minval = coordinate_counts[0].item()
+    maxval = coordinate_counts[-1].item()
     if maxval / minval > 10:
         # Do log10 scale
         # Find max power of 10
@@ -322,37 +316,31 @@ def OutputBubblePlot(bubble_results, outprefix, minval=None, maxval=None):
     outprefix : str
         Prefix to name output file
     """
-    # get periods in sort order
-    periods = set(bubble_results.keys())
-    periods.remove('ALL')
-    periods = list(periods)
-    periods.sort()
-    periods.insert(0, 'ALL')
+    periods = _SortedPeriods(bubble_results)
 
     for per in periods:
         per_results = bubble_results[per]
-        x_vals = [x for x, y in per_results.keys()]
-        y_vals = [y for x, y in per_results.keys()]
-        scale = 10000 / np.mean(list(per_results.values()))
+        # shape (n, 2) even when the period has no calls
+        coords = np.array(list(per_results.keys()), dtype=float).reshape(-1, 2)
+        counts = np.array(list(per_results.values()))
+        scale = 10000 / np.mean(counts)
         if minval is None:
-            minval = min(min(x_vals), min(y_vals))
+            minval = np.min(coords)
         if maxval is None:
-            maxval = max(max(x_vals), max(y_vals))
-        fig = plt.figure()
+            maxval = np.max(coords)
+        fig = _NewFigure()
         ax = fig.add_subplot(111)
         # Plot (0,0) separately so everything else is in front of it
-        if (0, 0) in per_results:
+        at_origin = np.all(coords == 0, axis=1)
+        if np.any(at_origin):
             ax.scatter(0, 0,
-                       s=np.sqrt(per_results[(0, 0)] * scale),
-                       color="darkblue",
-                       alpha=0.5)
-        for coord, count in per_results.items():
-            if coord == (0, 0):
-                continue
-            ax.scatter(coord[0], coord[1],
-                       s=np.sqrt(count * scale),
+                       s=np.sqrt(counts[at_origin] * scale),
                        color="darkblue",
                        alpha=0.5)
+        ax.scatter(coords[~at_origin, 0], coords[~at_origin, 1],
+                   s=np.sqrt(counts[~at_origin] * scale),
+                   color="darkblue",
+                   alpha=0.5)
         ax.set_xlabel("sum # repeats - file 1\n(diff from ref)", size=15)
         ax.set_ylabel("sum # repeats - file 2\n(diff from ref)", size=15)
         ax.plot([minval, maxval], [minval, maxval], linestyle="dashed",
@@ -362,7 +350,7 @@ def OutputBubblePlot(bubble_results, outprefix, minval=None, maxval=None):
         ax.axhline(y=0, linestyle="dashed", color="gray", alpha=0.75)
         ax.axvline(x=0, linestyle="dashed", color="gray", alpha=0.75)
         # plot dummy points for legend
-        legend_values = GetBubbleLegend(set(per_results.values()))
+        legend_values = GetBubbleLegend(counts)
         xval = (maxval - minval) / 10 + minval
         for i, val in enumerate(legend_values):
             step = (maxval - minval) / 15
@@ -371,7 +359,6 @@ def OutputBubblePlot(bubble_results, outprefix, minval=None, maxval=None):
             ax.annotate(val, xy=(xval + step, yval))
         fig.savefig(outprefix + "-bubble-period%s.pdf" % per,
                     bbox_inches='tight')
-        plt.close()
 
 
 def getargs():  # pragma: no cover
@@ -505,6 +492,271 @@ def NewOverallPeriod(format_fields, format_bins):
     return period_dict
 
 
+class _LocusResults:
+    """
+    Per-locus results, kept in one contiguous array per column.
+
+    The arrays are allocated up front and doubled in size whenever
+    they fill up, rather than appending one value at a time to lists.
+
+    Parameters
+    ----------
+    dtypes : Dict[str, Any]
+        The numpy dtype of each column
+    capacity : int
+        The number of loci to allocate space for initially
+    """
+
+    def __init__(self, dtypes, capacity=1024):
+        self.n_filled = 0
+        self.columns = {key: np.empty(capacity, dtype=dtype)
+                        for key, dtype in dtypes.items()}
+
+    def __len__(self):
+        return self.n_filled
+
+    def Extend(self, values):
+        """
+        Add the results of a set of loci.
+
+        Parameters
+        ----------
+        values : Dict[str, Any]
+            For each column, a sequence of values with one value per locus.
+            All columns must be given and be the same length.
+        """
+        n_new = len(next(iter(values.values())))
+        n_total = self.n_filled + n_new
+        capacity = len(next(iter(self.columns.values())))
+        if n_total > capacity:
+            capacity = max(2 * capacity, n_total)
+            for key, column in self.columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.n_filled] = column[:self.n_filled]
+                self.columns[key] = grown
+        for key, column in self.columns.items():
+            column[self.n_filled:n_total] = values[key]
+        self.n_filled = n_total
+
+    def GetColumns(self):
+        """
+        Get the results added so far.
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            For each column, a view of the filled part of its array
+        """
+        return {key: column[:self.n_filled]
+                for key, column in self.columns.items()}
+
+
+def _ExtendLocusResults(locus_results, values):
+    # Add the results of a set of loci, given as a sequence of values
+    # per column, to either a _LocusResults or a dict with a list per
+    # column (the locus results UpdateComparisonResults has always taken)
+    if isinstance(locus_results, _LocusResults):
+        locus_results.Extend(values)
+    else:
+        for key, column in values.items():
+            locus_results[key].extend(column)
+
+
+# Number of comparable record pairs main() collects before
+# adding their results to the running totals
+_COMPARISON_BATCH_SIZE = 256
+
+
+def _SharedAlleleCodes(alleles1, alleles2):
+    # Give the alleles of two records integer codes, such that two alleles
+    # are equal exactly when their codes are equal.
+    #
+    # Returns (codes1, codes2, n_codes). Each array of codes ends with
+    # two extra codes, one for -2 (not present due to smaller ploidy) and
+    # then one for -1 (nocall), so it can be indexed by genotype
+    # indicies directly. n_codes is the number of distinct codes,
+    # including the two extra ones.
+    _, codes = np.unique(np.concatenate((alleles1, alleles2)),
+                         return_inverse=True)
+    codes = codes.reshape(-1)
+    n_codes = int(np.max(codes)) + 1
+    extra_codes = [n_codes, n_codes + 1]
+    return (np.concatenate((codes[:len(alleles1)], extra_codes)),
+            np.concatenate((codes[len(alleles1):], extra_codes)),
+            n_codes + 2)
+
+
+def _ConcordantGenotypes(codes1, codes2, n_codes, unphased):
+    # For each row (sample) of two arrays of allele codes,
+    # whether the rows contain the same genotype.
+    # If unphased, the order of the alleles in each row is ignored.
+    #
+    # Each row is packed into one integer (a base n_codes number) so
+    # that each sample takes one comparison instead of one per allele.
+    if unphased:
+        codes1 = np.sort(codes1, axis=1)
+        codes2 = np.sort(codes2, axis=1)
+    ploidy = codes1.shape[1]
+    if n_codes ** ploidy > np.iinfo(np.int64).max:
+        # rows wouldn't fit in an int64, compare them allele by allele
+        return np.all(codes1 == codes2, axis=1)
+    powers = n_codes ** np.arange(ploidy, dtype=np.int64)
+    return codes1 @ powers == codes2 @ powers
+
+
+def _CompareCalls(record1, record2, sample_idxs, ignore_phasing):
+    # Compare the genotypes of the shared samples called in both records.
+    #
+    # Returns None if no shared sample was called in both records.
+    # Otherwise returns (both_called, called_sample_idxs, conc_seq,
+    # conc_len, sum_length_1, sum_length_2) where both_called is a mask
+    # over the shared samples and the remaining arrays only have entries
+    # for the samples called in both records.
+    both_called = np.logical_and(
+        record1.GetCalledSamples()[sample_idxs[0]],
+        record2.GetCalledSamples()[sample_idxs[1]]
+    )
+    if not np.any(both_called):
+        return None
+
+    chrom = record1.chrom
+    pos = record1.pos
+    reflen = len(record1.ref_allele) / len(record1.motif)
+
+    # build this so indexing later in the method is more intuitive
+    called_sample_idxs = []
+    for sample_idx in sample_idxs:
+        called_sample_idxs.append(sample_idx[both_called])
+
+    ploidies1 = record1.GetSamplePloidies()[called_sample_idxs[0]]
+    ploidies2 = record2.GetSamplePloidies()[called_sample_idxs[1]]
+    # Make sure gts are same ploidy. If not give up
+    if not np.array_equal(ploidies1, ploidies2):
+        raise ValueError("Found sample(s) of different ploidy at %s:%s" % (chrom, pos))
+
+    gt_idxs_1 = record1.GetGenotypeIndicies()[called_sample_idxs[0], :]
+    gt_idxs_2 = record2.GetGenotypeIndicies()[called_sample_idxs[1], :]
+
+    # Make sure same phasedness between calls. If not, give up
+    if ignore_phasing:
+        all_unphased = True
+    else:
+        unphased = (gt_idxs_1[:, -1] == 0) & (gt_idxs_2[:, -1] == 0)
+        all_unphased = np.all(unphased)
+        if not (all_unphased or np.all(~unphased)):
+            raise ValueError("Found sample(s) with different phasedness at %s:%s" % (chrom, pos))
+    gt_idxs_1 = gt_idxs_1[:, :-1]
+    gt_idxs_2 = gt_idxs_2[:, :-1]
+
+    if record1.HasFabricatedAltAlleles() or record2.HasFabricatedAltAlleles():
+        warnings.warn("Comparing sequences of a TRRecord generated by a"
+                      " caller which only generates length genotypes, not"
+                      " string genotypes. Its sequences are fabricated"
+                      " from the called lengths.")
+    # Compare integer codes of the allele sequences instead of the
+    # sequences themselves
+    seq_codes_1, seq_codes_2, n_codes = _SharedAlleleCodes(
+        [record1.ref_allele, *record1.alt_alleles],
+        [record2.ref_allele, *record2.alt_alleles]
+    )
+    conc_seq = _ConcordantGenotypes(seq_codes_1[gt_idxs_1],
+                                    seq_codes_2[gt_idxs_2],
+                                    n_codes, all_unphased)
+
+    allele_lengths_1 = [record1.ref_allele_length, *record1.alt_allele_lengths]
+    allele_lengths_2 = [record2.ref_allele_length, *record2.alt_allele_lengths]
+    length_codes_1, length_codes_2, n_codes = _SharedAlleleCodes(
+        allele_lengths_1, allele_lengths_2
+    )
+    conc_len = _ConcordantGenotypes(length_codes_1[gt_idxs_1],
+                                    length_codes_2[gt_idxs_2],
+                                    n_codes, all_unphased)
+
+    # Subtract the reference length from each allele once, then look up
+    # the called samples' genotypes in that table. The lengths match
+    # GetLengthGenotypes (-2 stays -2)
+    length_diffs_1 = np.array([*allele_lengths_1, -2, -1]) - reflen
+    length_diffs_2 = np.array([*allele_lengths_2, -2, -1]) - reflen
+    sum_length_1 = np.sum(length_diffs_1[gt_idxs_1], axis=1)
+    sum_length_2 = np.sum(length_diffs_2[gt_idxs_2], axis=1)
+
+    return (both_called, called_sample_idxs, conc_seq, conc_len,
+            sum_length_1, sum_length_2)
+
+
+def _AddCallsToFormatBin(format_bin_results, conc_seq, conc_len,
+                         sum_length_1, sum_length_2):
+    # Add a set of compared calls to a bin of the overall results
+    # (see NewOverallFormatBin)
+    format_bin_results['numcalls'] += conc_seq.shape[0]
+    format_bin_results['conc_seq_count'] += np.sum(conc_seq)
+    format_bin_results['conc_len_count'] += np.sum(conc_len)
+    format_bin_results['total_len_1'] += np.sum(sum_length_1)
+    format_bin_results['total_len_2'] += np.sum(sum_length_2)
+    format_bin_results['total_len_11'] += np.sum(sum_length_1 ** 2)
+    format_bin_results['total_len_12'] += np.sum(sum_length_1 * sum_length_2)
+    format_bin_results['total_len_22'] += np.sum(sum_length_2 ** 2)
+
+
+def _FormatBinIndicies(fmt1, fmt2, bins, stratify_file):
+    # For each call, the index of the FORMAT bin (see GetFormatFields)
+    # its FORMAT values fall in, or -1 if they don't fall in a bin.
+    # Bins include their start but not their end, except for the last bin
+    # which includes both. fmt1 and fmt2 are the FORMAT values of the call
+    # in each file, which file(s) are used depends on stratify_file.
+    def bin_indicies(values):
+        # compare in the precision of the values, the same as comparing
+        # them to each python float bound would
+        if np.issubdtype(values.dtype, np.floating):
+            bounds = np.asarray(bins, dtype=values.dtype)
+        else:
+            bounds = np.asarray(bins, dtype=float)
+        idxs = np.searchsorted(bounds, values, side='right') - 1
+        idxs[values == bounds[-1]] = len(bins) - 2
+        # past the end of the last bin, or nan
+        idxs[idxs == len(bins) - 1] = -1
+        return idxs
+
+    if stratify_file == 1:
+        return bin_indicies(fmt1)
+    if stratify_file == 2:
+        return bin_indicies(fmt2)
+    idxs1 = bin_indicies(fmt1)
+    return np.where(idxs1 == bin_indicies(fmt2), idxs1, -1)
+
+
+def _AddCallsToFormatBins(format_results, bins, bin_idxs, conc_seq, conc_len,
+                          sum_length_1, sum_length_2):
+    # Add a set of compared calls to the bins of a FORMAT field in the
+    # overall results (see NewOverallPeriod). bin_idxs gives the bin
+    # of each call (see _FormatBinIndicies).
+    # All the bins are summed over in a single pass per quantity.
+    in_bin = bin_idxs >= 0
+    bin_idxs = bin_idxs[in_bin]
+    sum_length_1 = sum_length_1[in_bin]
+    sum_length_2 = sum_length_2[in_bin]
+    n_bins = len(bins) - 1
+
+    def bin_sums(weights=None):
+        return np.bincount(bin_idxs, weights=weights, minlength=n_bins)
+
+    numcalls = bin_sums()
+    sums = {
+        'conc_seq_count': np.bincount(bin_idxs[conc_seq[in_bin]], minlength=n_bins),
+        'conc_len_count': np.bincount(bin_idxs[conc_len[in_bin]], minlength=n_bins),
+        'total_len_1': bin_sums(sum_length_1),
+        'total_len_2': bin_sums(sum_length_2),
+        'total_len_11': bin_sums(sum_length_1 ** 2),
+        'total_len_12': bin_sums(sum_length_1 * sum_length_2),
+        'total_len_22': bin_sums(sum_length_2 ** 2)
+    }
+    for idx in np.flatnonzero(numcalls):
+        format_bin_results = format_results[bins[idx]]
+        format_bin_results['numcalls'] += numcalls[idx]
+        for field, field_sums in sums.items():
+            format_bin_results[field] += field_sums[idx]
+
+
 def UpdateComparisonResults(record1, record2, sample_idxs,
                             ignore_phasing,
                             stratify_by_period,
@@ -535,162 +787,157 @@ def UpdateComparisonResults(record1, record2, sample_idxs,
     overall_results : dict
         Period and format nested dictionary to update.
     locus_results : dict
-       Locus-stratified results dictionary to update.
+       Locus-stratified results dictionary to update,
+       with a list of values per column.
     sample_results : dict
        Sample-stratified results dictionary to update.
     bubble_results : dict
         dictionary of counts to update
     """
-    # Extract shared info
-    chrom = record1.chrom
-    pos = record1.pos
-    period = len(record1.motif)
-    reflen = len(record1.ref_allele) / period
+    UpdateComparisonResultsBatch([(record1, record2)], sample_idxs,
+                                 ignore_phasing, stratify_by_period,
+                                 format_fields, format_bins, stratify_file,
+                                 overall_results, locus_results,
+                                 sample_results, bubble_results)
+
+
+def UpdateComparisonResultsBatch(record_pairs, sample_idxs,
+                                 ignore_phasing,
+                                 stratify_by_period,
+                                 format_fields, format_bins, stratify_file,
+                                 overall_results, locus_results,
+                                 sample_results, bubble_results):
+    r"""Extract comparable results from a batch of pairs of VCF records
+
+    Same as calling UpdateComparisonResults on each pair in turn,
+    but the calls of all the pairs are compared first and then added
+    to the results together, so the per-period, per-FORMAT-bin and
+    per-sample bookkeeping is done once per batch instead of once
+    per locus.
 
-    both_called = np.logical_and(
-        record1.GetCalledSamples()[sample_idxs[0]],
-        record2.GetCalledSamples()[sample_idxs[1]]
-    )
-    numcalls = np.sum(both_called)
-    if numcalls == 0:
-        return
-
-    locus_results["chrom"].append(chrom)
-    locus_results["start"].append(pos)
-    locus_results["numcalls"].append(numcalls)
-    sample_results['numcalls'] += both_called
-
-    # build this so indexing later in the method is more intuitive
-    called_sample_idxs = []
-    for sample_idx in sample_idxs:
-        called_sample_idxs.append(sample_idx[both_called])
-
-    ploidies1 = record1.GetSamplePloidies()[called_sample_idxs[0]]
-    ploidies2 = record2.GetSamplePloidies()[called_sample_idxs[1]]
-    # Make sure gts are same ploidy. If not give up
-    if not np.all(ploidies1 == ploidies2):
-        raise ValueError("Found sample(s) of different ploidy at %s:%s" % (chrom, pos))
-
-    gts_string_1 = record1.GetStringGenotypes()[called_sample_idxs[0], :]
-    gts_string_2 = record2.GetStringGenotypes()[called_sample_idxs[1], :]
-
-    # Make sure same phasedness between calls. If not, give up
-    if ignore_phasing:
-        all_unphased = True
-    else:
-        unphased = (gts_string_1[:, -1] == '0') & (gts_string_2[:, -1] == '0')
-        all_unphased = np.all(unphased)
-        if not (all_unphased or np.all(~unphased)):
-            raise ValueError("Found sample(s) with different phasedness at %s:%s" % (chrom, pos))
-
-    gts_string_1 = gts_string_1[:, :-1]
-    gts_string_2 = gts_string_2[:, :-1]
-    if all_unphased:
-        gts_string_1 = np.sort(gts_string_1, axis=1)
-        gts_string_2 = np.sort(gts_string_2, axis=1)
-    conc_seq = np.all(gts_string_1 == gts_string_2, axis=1)
-
-    locus_results["metric-conc-seq"].append(np.sum(conc_seq) / numcalls)
-    sample_results['conc-seq-count'][both_called] += conc_seq
-
-    gts_length_1 = record1.GetLengthGenotypes()[called_sample_idxs[0], :-1]
-    gts_length_2 = record2.GetLengthGenotypes()[called_sample_idxs[1], :-1]
-    if all_unphased:
-        gts_length_1 = np.sort(gts_length_1, axis=1)
-        gts_length_2 = np.sort(gts_length_2, axis=1)
-    conc_len = np.all(gts_length_1 == gts_length_2, axis=1)
-
-    locus_results["metric-conc-len"].append(np.sum(conc_len) / numcalls)
-    sample_results['conc-len-count'][both_called] += conc_len
+    Parameters
+    ----------
+    record_pairs : list of (trh.TRRecord, trh.TRRecord)
+       Pairs of records to compare, in the order they were read
+    sample_idxs : list of np.array
+        See UpdateComparisonResults
+    stratify_by_period : bool
+        If True, also stratify results by period
+    format_fields : list of str
+       List of format fields to extract
+    format_bins : List[List[float]]
+        List of bin start/stop coords for each FORMAT field
+    stratify_file : {0, 1, 2}
+        Specify whether to apply FORMAT stratification to both files (0), or only (1) or (2)
+    overall_results : dict
+        Period and format nested dictionary to update.
+    locus_results : dict
+       See UpdateComparisonResults. A _LocusResults,
+       as used by main(), is also accepted.
+    sample_results : dict
+       Sample-stratified results dictionary to update.
+    bubble_results : dict
+        dictionary of counts to update
+    """
+    # Compare each pair of records, keeping only the calls
+    # made in both records
+    chroms = []
+    starts = []
+    periods = []
+    both_called = []
+    comparisons = ([], [], [], [])
+    format_values = {fmt: ([], []) for fmt in format_fields}
+    for record1, record2 in record_pairs:
+        comparison = _CompareCalls(record1, record2, sample_idxs,
+                                   ignore_phasing)
+        if comparison is None:
+            continue
+        locus_both_called, called_sample_idxs = comparison[:2]
+        chroms.append(record1.chrom)
+        starts.append(record1.pos)
+        periods.append(len(record1.motif))
+        both_called.append(locus_both_called)
+        for calls, locus_calls in zip(comparisons, comparison[2:]):
+            calls.append(locus_calls)
+        for fmt in format_fields:
+            format_values[fmt][0].append(
+                record1.format[fmt][called_sample_idxs[0], 0])
+            format_values[fmt][1].append(
+                record2.format[fmt][called_sample_idxs[1], 0])
 
-    sum_length_1 = np.sum(gts_length_1 - reflen, axis=1)
-    sum_length_2 = np.sum(gts_length_2 - reflen, axis=1)
+    if len(chroms) == 0:
+        return
 
-    outer_keys = ['ALL']
+    # Each array below has one entry per call, ordered by locus
+    # and then by sample
+    both_called = np.stack(both_called)
+    numcalls = np.sum(both_called, axis=1)
+    conc_seq, conc_len, sum_length_1, sum_length_2 = \
+        (np.concatenate(calls) for calls in comparisons)
+    call_samples = np.nonzero(both_called)[1]
+
+    # each locus has at least one call and its calls are contiguous,
+    # so the per locus counts are sums over consecutive segments
+    locus_offsets = np.cumsum(numcalls) - numcalls
+    _ExtendLocusResults(locus_results, {
+        "chrom": chroms,
+        "start": starts,
+        "numcalls": numcalls,
+        "metric-conc-seq":
+            np.add.reduceat(conc_seq, locus_offsets, dtype=int) / numcalls,
+        "metric-conc-len":
+            np.add.reduceat(conc_len, locus_offsets, dtype=int) / numcalls,
+    })
+
+    n_samples = both_called.shape[1]
+    sample_results['numcalls'] += np.sum(both_called, axis=0)
+    sample_results['conc-seq-count'] += \
+        np.bincount(call_samples[conc_seq], minlength=n_samples)
+    sample_results['conc-len-count'] += \
+        np.bincount(call_samples[conc_len], minlength=n_samples)
+
+    # The calls that count towards each outer key
+    outer_calls = {'ALL': slice(None)}
     if stratify_by_period:
-        outer_keys.append(period)
-        if period not in overall_results:
-            overall_results[period] = NewOverallPeriod(format_fields, format_bins)
-            if bubble_results:
-                bubble_results[period] = {}
+        # group the calls by period in one pass
+        # instead of comparing every call against each period
+        batch_periods, period_idxs = np.unique(periods, return_inverse=True)
+        call_period_idxs = np.repeat(period_idxs, numcalls)
+        by_period = np.argsort(call_period_idxs, kind='stable')
+        period_starts = np.cumsum(np.bincount(call_period_idxs))[:-1]
+        for period, calls in zip(batch_periods.tolist(),
+                                 np.split(by_period, period_starts)):
+            outer_calls[period] = calls
+            if period not in overall_results:
+                overall_results[period] = NewOverallPeriod(format_fields, format_bins)
+                if bubble_results:
+                    bubble_results[period] = {}
 
     # handle bubble results
     if bubble_results:
         length_sums = np.stack((sum_length_1, sum_length_2)).T
-        coords, counts = np.unique(length_sums, axis=0, return_counts=True)
-        for coord, count in zip((tuple(row) for row in coords), counts):
-            if coord not in bubble_results['ALL']:
-                bubble_results['ALL'][coord] = 0
-            if stratify_by_period and coord not in bubble_results[period]:
-                bubble_results[period][coord] = 0
-
-            bubble_results['ALL'][coord] += count
-            if stratify_by_period:
-                bubble_results[period][coord] += count
+        for key, calls in outer_calls.items():
+            coords, counts = np.unique(length_sums[calls], axis=0, return_counts=True)
+            for coord, count in zip((tuple(row) for row in coords), counts):
+                if coord not in bubble_results[key]:
+                    bubble_results[key][coord] = 0
+                bubble_results[key][coord] += count
 
     # handle overall results
-    for key in outer_keys:
-        overall_results[key]['ALL']['numcalls'] += numcalls
-        overall_results[key]['ALL']['conc_seq_count'] += np.sum(conc_seq)
-        overall_results[key]['ALL']['conc_len_count'] += np.sum(conc_len)
-        overall_results[key]['ALL']['total_len_1'] += np.sum(sum_length_1)
-        overall_results[key]['ALL']['total_len_2'] += np.sum(sum_length_2)
-        overall_results[key]['ALL']['total_len_11'] += np.sum(sum_length_1 ** 2)
-        overall_results[key]['ALL']['total_len_12'] += np.sum(sum_length_1 * sum_length_2)
-        overall_results[key]['ALL']['total_len_22'] += np.sum(sum_length_2 ** 2)
+    for key, calls in outer_calls.items():
+        _AddCallsToFormatBin(overall_results[key]['ALL'], conc_seq[calls],
+                             conc_len[calls], sum_length_1[calls],
+                             sum_length_2[calls])
 
     for fmt, bins in zip(format_fields, format_bins):
-        fmt1 = record1.format[fmt][sample_idxs[0], 0]
-        fmt2 = record2.format[fmt][sample_idxs[1], 0]
-        masks = []
-        for idx in range(len(bins) - 2):
-            if stratify_file == 0:
-                mask = ((fmt1 >= bins[idx]) & (fmt1 < bins[idx + 1]) &
-                        (fmt2 >= bins[idx]) & (fmt2 < bins[idx + 1]))
-            elif stratify_file == 1:
-                mask = (fmt1 >= bins[idx]) & (fmt1 < bins[idx + 1])
-            elif stratify_file == 2:
-                mask = (fmt2 >= bins[idx]) & (fmt2 < bins[idx + 1])
-            masks.append(mask[both_called])
-
-        # last bin has inclusive end
-        if stratify_file == 0:
-            mask = ((fmt1 >= bins[-2]) & (fmt1 <= bins[-1]) &
-                    (fmt2 >= bins[-2]) & (fmt2 <= bins[-1]))
-        elif stratify_file == 1:
-            mask = (fmt1 >= bins[-2]) & (fmt1 <= bins[-1])
-        elif stratify_file == 2:
-            mask = (fmt2 >= bins[-2]) & (fmt2 <= bins[-1])
-        masks.append(mask[both_called])
-
-        for _bin, mask in zip(bins[:-1], masks):
-            ncalls = np.sum(mask)
-            if ncalls == 0:
-                continue
-            conc_seq_count = np.sum(conc_seq[mask])
-            conc_len_count = np.sum(conc_len[mask])
-            total_len_1 = np.sum(sum_length_1[mask])
-            total_len_2 = np.sum(sum_length_2[mask])
-            total_len_11 = np.sum(sum_length_1[mask] ** 2)
-            total_len_12 = np.sum(sum_length_1[mask] * sum_length_2[mask])
-            total_len_22 = np.sum(sum_length_2[mask] ** 2)
-            for key in outer_keys:
-                overall_results[key][fmt][_bin]['numcalls'] += \
-                    ncalls
-                overall_results[key][fmt][_bin]['conc_seq_count'] += \
-                    conc_seq_count
-                overall_results[key][fmt][_bin]['conc_len_count'] += \
-                    conc_len_count
-                overall_results[key][fmt][_bin]['total_len_1'] += \
-                    total_len_1
-                overall_results[key][fmt][_bin]['total_len_2'] += \
-                    total_len_2
-                overall_results[key][fmt][_bin]['total_len_11'] += \
-                    total_len_11
-                overall_results[key][fmt][_bin]['total_len_12'] += \
-                    total_len_12
-                overall_results[key][fmt][_bin]['total_len_22'] += \
-                    total_len_22
+        bin_idxs = _FormatBinIndicies(np.concatenate(format_values[fmt][0]),
+                                      np.concatenate(format_values[fmt][1]),
+                                      bins, stratify_file)
+        for key, calls in outer_calls.items():
+            _AddCallsToFormatBins(overall_results[key][fmt], bins,
+                                  bin_idxs[calls], conc_seq[calls],
+                                  conc_len[calls], sum_length_1[calls],
+                                  sum_length_2[calls])
 
 
 def check_region(contigs1, contigs2, region_str):
@@ -810,7 +1057,7 @@ def main(args):
     vcfreaders = utils.LoadReaders([args.vcf1, args.vcf2], checkgz=True)
     if vcfreaders is None or len(vcfreaders) != 2:
         return 1
-    chroms = utils.GetContigs(vcfreaders[0])
+    chroms = mergeutils.GetChromIndices(utils.GetContigs(vcfreaders[0]))
 
     ### Load shared samples ###
     samples = mergeutils.GetSharedSamples(vcfreaders)
@@ -827,9 +1074,11 @@ def main(args):
     samples.sort()
     sample_idxs = []
     for vcf in vcfreaders:
-        sort = np.argsort(vcf.samples)
-        rank = np.searchsorted(vcf.samples, samples, sorter=sort)
-        sample_idxs.append(sort[rank])
+        sample_positions = {sample: idx for idx, sample in enumerate(vcf.samples)}
+        sample_idxs.append(np.fromiter(
+            (sample_positions[sample] for sample in samples),
+            dtype=np.intp, count=len(samples)
+        ))
     # now we have vcfreaders[i].samples[sample_idxs[i]] == samples
 
     ### Determine FORMAT fields we should look for ###
@@ -840,13 +1089,13 @@ def main(args):
                                                  vcfreaders)
 
     ### Keep track of data to summarize at the end ###
-    locus_results = {
-        "chrom": [],
-        "start": [],
-        "numcalls": [],
-        "metric-conc-seq": [],
-        "metric-conc-len": [],
-    }
+    locus_results = _LocusResults({
+        "chrom": object,
+        "start": int,
+        "numcalls": int,
+        "metric-conc-seq": float,
+        "metric-conc-len": float,
+    })
     sample_results = {
         "numcalls": np.zeros((len(samples)), dtype=int),
         "conc-seq-count": np.zeros((len(samples)), dtype=int),
@@ -891,12 +1140,20 @@ def main(args):
     num_records = 0
     compared_records = 0
 
+    # harmonized versions of current_records, None for records that
+    # haven't been harmonized yet. Only the records that were just read
+    # need to be harmonized, the other one is kept from the previous loop
+    harmonized_records = [None, None]
+    # comparable record pairs whose results have not been added yet
+    record_pairs = []
+
     while not done:
-        if any([item is None for item in current_records]): break
+        if current_records[0] is None or current_records[1] is None: break
         if args.numrecords is not None and num_records >= args.numrecords: break
 
-        harmonized_records = [trh.HarmonizeRecord(vcf_types[i], current_records[i]) for i in
-                              range(len(current_records))]
+        for i in range(2):
+            if harmonized_records[i] is None:
+                harmonized_records[i] = trh.HarmonizeRecord(vcf_types[i], current_records[i])
         # increments contains information about which record should be
         # skipped in next iteration
         increment, comparable = mergeutils.GetIncrementAndComparability(harmonized_records, chroms,
@@ -905,19 +1162,33 @@ def main(args):
         if args.verbose: mergeutils.DebugPrintRecordLocations(current_records, increment)
         if mergeutils.CheckMin(increment): return 1
         if comparable:
-            UpdateComparisonResults(*harmonized_records,
-                                    sample_idxs,
-                                    args.ignore_phasing, args.period,
-                                    format_fields, format_bins,
-                                    args.stratify_file,
-                                    overall_results, locus_results,
-                                    sample_results, bubble_results)
+            record_pairs.append(tuple(harmonized_records))
+            if len(record_pairs) == _COMPARISON_BATCH_SIZE:
+                UpdateComparisonResultsBatch(record_pairs,
+                                             sample_idxs,
+                                             args.ignore_phasing, args.period,
+                                             format_fields, format_bins,
+                                             args.stratify_file,
+                                             overall_results, locus_results,
+                                             sample_results, bubble_results)
+                record_pairs = []
             compared_records += 1
 
-        current_records = mergeutils.GetNextRecords(vcfregions, current_records, increment)
-        done = mergeutils.DoneReading(current_records)
+        for i in range(2):
+            if increment[i]:
+                current_records[i] = next(vcfregions[i], None)
+                harmonized_records[i] = None
+        done = current_records[0] is None and current_records[1] is None
         num_records += 1
 
+    UpdateComparisonResultsBatch(record_pairs,
+                                 sample_idxs,
+                                 args.ignore_phasing, args.period,
+                                 format_fields, format_bins,
+                                 args.stratify_file,
+                                 overall_results, locus_results,
+                                 sample_results, bubble_results)
+
     if compared_records == 0:
         common.WARNING("No comparable records were found, exiting!")
         return 1
@@ -927,7 +1198,7 @@ def main(args):
     if not args.noplot: OutputBubblePlot(bubble_results, args.out, minval=args.bubble_min, maxval=args.bubble_max)
 
     ### Per-locus metrics ###
-    OutputLocusMetrics(locus_results, args.out, args.noplot)
+    OutputLocusMetrics(locus_results.GetColumns(), args.out, args.noplot)
 
     ### Per-sample metrics ###
     OutputSampleMetrics(sample_results, samples, args.out, args.noplot)
@@ -2,10 +2,14 @@ import argparse
 import os
 from typing import List
 
+import cyvcf2
 import numpy as np
 import pytest
+import trtools.utils.tr_harmonizer as trh
 from trtools.utils.tests.test_mergeutils import DummyHarmonizedRecord
 from ..compareSTR import *
+from ..compareSTR import _ConcordantGenotypes, _FormatBinIndicies, _LocusResults, \
+    _SharedAlleleCodes
 
 
 # Set up base argparser
@@ -292,6 +296,133 @@ def test_hipstr_position_harmonisation(tmpdir, vcfdir):
         ## vcf1 : flanking bp at both sides, vcf2: no flanking bp
         assert lines[4] == "1	125557	1.0	1.0	1\n"
 
+# Results should not depend on how many records are compared at once
+def test_comparison_batch_size(tmpdir, vcfdir, monkeypatch):
+    vcfcomp = os.path.join(vcfdir, "compareSTR_vcfs")
+
+    def run(out):
+        args = base_argparse(tmpdir)
+        args.vcf1 = os.path.join(vcfcomp, "test_gangstr1.vcf.gz")
+        args.vcf2 = os.path.join(vcfcomp, "test_gangstr2.vcf.gz")
+        args.out = str(tmpdir / out)
+        args.region = None
+        args.period = True
+        args.noplot = True
+        args.stratify_fields = 'DP'
+        args.stratify_binsizes = '0:100:10'
+        assert main(args) == 0
+        outputs = {}
+        for suffix in ("-locuscompare.tab", "-samplecompare.tab", "-overall.tab"):
+            with open(str(tmpdir / out) + suffix) as outfile:
+                outputs[suffix] = [line.split('\t') for line in outfile]
+        return outputs
+
+    batched = run("batched")
+    monkeypatch.setattr("trtools.compareSTR.compareSTR._COMPARISON_BATCH_SIZE", 1)
+    unbatched = run("unbatched")
+
+    assert batched["-locuscompare.tab"] == unbatched["-locuscompare.tab"]
+    assert batched["-samplecompare.tab"] == unbatched["-samplecompare.tab"]
+    # sums may be accumulated in a different order
+    assert len(batched["-overall.tab"]) == len(unbatched["-overall.tab"])
+    for line1, line2 in zip(batched["-overall.tab"][1:], unbatched["-overall.tab"][1:]):
+        assert line1[:-4] == line2[:-4]
+        assert [float(val) for val in line1[-4:]] == \
+            pytest.approx([float(val) for val in line2[-4:]], nan_ok=True)
+
+
+def test_UpdateComparisonResults(vcfdir):
+    fname = os.path.join(vcfdir, "compareSTR_vcfs", "test_gangstr1.vcf.gz")
+    records = list(trh.TRRecordHarmonizer(cyvcf2.VCF(fname), vcftype="gangstr"))[:5]
+    n_samples = records[0].GetNumSamples()
+    sample_idxs = [np.arange(n_samples), np.arange(n_samples)]
+
+    def new_results():
+        sample_results = {key: np.zeros(n_samples, dtype=int) for key in
+                          ("numcalls", "conc-seq-count", "conc-len-count")}
+        return {'ALL': NewOverallPeriod([], [])}, sample_results, {'ALL': {}}
+
+    # one pair at a time, into the plain dict of lists
+    overall, samples, bubbles = new_results()
+    locus_results = {key: [] for key in
+                     ("chrom", "start", "numcalls", "metric-conc-seq", "metric-conc-len")}
+    for record in records:
+        UpdateComparisonResults(record, record, sample_idxs, False, False,
+                                [], [], 0, overall, locus_results, samples,
+                                bubbles)
+
+    # all pairs at once, into the arrays main() uses
+    batch_overall, batch_samples, batch_bubbles = new_results()
+    batch_locus_results = _LocusResults({key: object for key in locus_results})
+    UpdateComparisonResultsBatch([(record, record) for record in records],
+                                 sample_idxs, False, False, [], [], 0,
+                                 batch_overall, batch_locus_results,
+                                 batch_samples, batch_bubbles)
+
+    assert len(locus_results["chrom"]) == len(batch_locus_results) > 0
+    for key, column in batch_locus_results.GetColumns().items():
+        assert list(column) == locus_results[key]
+    assert locus_results["metric-conc-len"] == [1] * len(records)
+    for key in samples:
+        assert np.array_equal(samples[key], batch_samples[key])
+    assert bubbles == batch_bubbles
+    assert overall['ALL']['ALL'] == pytest.approx(batch_overall['ALL']['ALL'])
+
+
+def test_LocusResults():
+    results = _LocusResults({"chrom": object, "start": int}, capacity=2)
+    assert len(results) == 0
+    assert results.GetColumns()["chrom"].shape == (0,)
+
+    results.Extend({"chrom": ["chr1"], "start": [10]})
+    # grows past the initial capacity
+    results.Extend({"chrom": ["chr1", "chr2", "chr2"], "start": [20, 5, 7]})
+    assert len(results) == 4
+    columns = results.GetColumns()
+    assert list(columns["chrom"]) == ["chr1", "chr1", "chr2", "chr2"]
+    assert np.array_equal(columns["start"], [10, 20, 5, 7])
+
+
+def test_ConcordantGenotypes():
+    codes1, codes2, n_codes = _SharedAlleleCodes([3, 4.5, 5], [4.5, 3, 6])
+    assert n_codes == 6
+    assert list(codes1) == [0, 1, 2, 4, 5]
+    assert list(codes2) == [1, 0, 3, 4, 5]
+
+    # lengths 3/4.5, 4.5/3, 5/5, 3/-2 vs 4.5/3, 4.5/3, 6/3, 3/-2
+    gts1 = codes1[np.array([[0, 1], [1, 0], [2, 2], [0, -2]])]
+    gts2 = codes2[np.array([[0, 1], [0, 1], [2, 1], [1, -2]])]
+    assert list(_ConcordantGenotypes(gts1, gts2, n_codes, False)) == \
+        [False, True, False, True]
+    assert list(_ConcordantGenotypes(gts1, gts2, n_codes, True)) == \
+        [True, True, False, True]
+
+    # too many alleles to pack each genotype into an int64
+    gts = np.array([[0, 299] * 10, [299, 0] * 10])
+    assert list(_ConcordantGenotypes(gts, gts[::-1], 300, False)) == \
+        [False, False]
+    assert list(_ConcordantGenotypes(gts, gts[::-1], 300, True)) == \
+        [True, True]
+
+
+def test_FormatBinIndicies():
+    bins = [0, 10, 20, 25]
+    fmt1 = np.array([-1, 0, 9.5, 10, 24, 25, 26, np.nan])
+    fmt2 = np.array([0, 0, 10, 10, 20, 25, 25, 0])
+    assert list(_FormatBinIndicies(fmt1, fmt2, bins, 1)) == \
+        [-1, 0, 0, 1, 2, 2, -1, -1]
+    assert list(_FormatBinIndicies(fmt1, fmt2, bins, 2)) == \
+        [0, 0, 1, 1, 2, 2, 2, 0]
+    # both values must be in the same bin
+    assert list(_FormatBinIndicies(fmt1, fmt2, bins, 0)) == \
+        [-1, 0, -1, 1, 2, 2, -1, -1]
+
+    # float32 values are compared to the bounds as float32s
+    bins = np.arange(0, 1, 0.1).tolist() + [1]
+    fmt = np.array([0.7, 0.95, 1], dtype=np.float32)
+    assert list(_FormatBinIndicies(fmt, fmt, bins, 0)) == [7, 9, 9]
+
+
 def test_wrong_vcftype(tmpdir, vcfdir, capsys):
     args = base_argparse(tmpdir)
     vcfcomp = os.path.join(vcfdir, "compareSTR_vcfs")
@@ -342,6 +473,11 @@ def test_region(tmpdir, vcfdir, capsys):
     retcode = main(args)
     assert retcode == 1
 
+def test_OutputBubblePlot_no_calls(tmpdir):
+    outprefix = str(tmpdir / "test")
+    OutputBubblePlot({'ALL': {}}, outprefix, minval=-5, maxval=5)
+    assert os.path.exists(outprefix + "-bubble-periodALL.pdf")
+
 def test_GetBubbleLegend():
     # only 3 values
     sample_counts = [1,2,3]
@@ -361,3 +497,12 @@ def test_GetBubbleLegend():
     expected = [1, 10, 100]
     assert all([a == b for a, b in zip(actual, expected)])
 
+    # repeated counts are only considered once
+    sample_counts = np.array([5, 7, 5, 5, 7])
+    assert GetBubbleLegend(sample_counts) == [5, 7]
+    assert GetBubbleLegend([5, 5, 7]) == [5, 7]
+
+    # sets of counts are accepted too
+    assert GetBubbleLegend({1, 5, 100, 1000}) == [1, 10, 1000]
+    assert GetBubbleLegend({7, 5}) == [5, 7]
+
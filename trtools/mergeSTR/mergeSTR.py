@@ -606,6 +606,7 @@ def main(args: Any) -> int:
     # WriteMergedHeader will confirm that the list of contigs is the same for
     # each vcf, so just pulling it from one here is fine
     chroms = utils.GetContigs(vcfreaders[0])
+    chrom_indices = mergeutils.GetChromIndices(chroms)
 
     ### Check inferred type of each is the same
     try:
@@ -636,7 +637,7 @@ def main(args: Any) -> int:
     while not done:
         for vcf_num, (r, reader) in enumerate(zip(current_records, vcfreaders)):
             if r is None: continue
-            if not r.CHROM in chroms:
+            if not r.CHROM in chrom_indices:
                 common.WARNING((
                                    "Error: found a record in file {} with "
                                    "chromosome '{}' which was not found in the contig list "
@@ -654,7 +655,7 @@ def main(args: Any) -> int:
         # mergeSTR doesnt provide custom comparability handler. By default, only the increment is necessary to decide
         # which records should be merged during single iteration. This is because the merge is based on the position
         # of the records. If this behaviour changes in the future, custom mergability handler will have to be created.
-        increment, _ = mergeutils.GetIncrementAndComparability(harmonized_records, chroms)
+        increment, _ = mergeutils.GetIncrementAndComparability(harmonized_records, chrom_indices)
 
         if args.verbose: mergeutils.DebugPrintRecordLocations(current_records, increment)
         if mergeutils.CheckMin(increment): return 1
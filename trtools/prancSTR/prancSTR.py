@@ -203,18 +203,24 @@ def ExtractAB(trrecord):
        [(A,B), ..] genotypes for each sample
        given in terms of bp diff from ref
     """
-    full_gts = trrecord.GetStringGenotypes()
     reflen = len(trrecord.ref_allele)
+    # bp diff from ref of each allele, looked up for all samples at once.
+    # The last two entries line up with the -2 (lower ploidy) and
+    # -1 (no call) genotype indicies, the same as GetStringGenotypes
+    allele_diffs = np.array([len(allele) - reflen for allele in
+                             [trrecord.ref_allele, *trrecord.alt_alleles,
+                              ',', '.']])
+    diffs = allele_diffs[trrecord.GetGenotypeIndicies()[:, :-1]]
+    if diffs.shape[1] < 2:
+        # Records with a max ploidy of 1 have no second allele.
+        # This B (the length of the one character phasing string)
+        # is not meaningful, it is only kept so that prancSTR's
+        # output for such records doesn't change
+        diffs = np.column_stack((diffs, np.full(diffs.shape[0], 1 - reflen)))
+    diffs = diffs[:, :2].tolist()
     called = trrecord.GetCalledSamples()
-    genotypes = []
-    for i in range(len(full_gts)):
-        item = full_gts[i]
-        if not called[i]:
-            genotypes.append([None, None])
-        else:
-            genotypes.append([int((len(item[0])-reflen)),
-                              int((len(item[1])-reflen))])
-    return genotypes
+    return [diff if is_called else [None, None]
+            for diff, is_called in zip(diffs, called)]
 
 
 def ExtractReadVector(mallreads, period):
@@ -458,9 +464,12 @@ def main(args):
     usesamples = []
     if args.samples is not None:
         usesamples = args.samples.split(",")
+        sample_set = set(samples)
         for s in usesamples:
-            if s not in samples:
+            if s not in sample_set:
                 common.WARNING("WARNING: sample {} not found in the VCF".format(s))
+    # checked once per sample per record below
+    usesamples = frozenset(usesamples)
 
     if args.out == "stdout":
         outf = sys.stdout
@@ -1,6 +1,8 @@
 import argparse
 import os
+import types
 
+import cyvcf2
 import pytest
 
 from ..prancSTR import *
@@ -204,6 +206,31 @@ def test_MaximizeMosaicLikelihoodBoth3():
     assert C == -5
     assert f == pytest.approx(0.0167, abs=1e-2)
 
+# Test <A,B> extraction against the per-sample string genotypes
+def test_ExtractAB(vcfdir):
+    fname = os.path.join(vcfdir, "test_hipstr.vcf")
+    harmonizer = trh.TRRecordHarmonizer(cyvcf2.VCF(fname), vcftype="hipstr")
+    for trrecord in harmonizer:
+        reflen = len(trrecord.ref_allele)
+        called = trrecord.GetCalledSamples()
+        expected = [[len(gt[0]) - reflen, len(gt[1]) - reflen] if called[i]
+                    else [None, None]
+                    for i, gt in enumerate(trrecord.GetStringGenotypes())]
+        assert ExtractAB(trrecord) == expected
+
+# Records with a max ploidy of 1 have no second allele,
+# only A is meaningful
+def test_ExtractAB_haploid():
+    gts = np.array([[0, 0], [1, 1], [-1, 0]], dtype=np.int16)
+    vcfrecord = types.SimpleNamespace(
+        POS=42, CHROM="chrX", REF="CAGCAG", ALT=["CAGCAGCAG"], INFO={}, FORMAT={},
+        genotype=types.SimpleNamespace(array=lambda: gts.copy())
+    )
+    trrecord = trh.TRRecord(vcfrecord, "CAGCAG", ["CAGCAGCAG"], "CAG", "", None)
+    genotypes = ExtractAB(trrecord)
+    assert [gt[0] for gt in genotypes] == [0, 3, None]
+    assert genotypes[2] == [None, None]
+
 # Test values of the alleles into the difference in repetitions with respect to the reference
 def test_ExtractReadVector1():
     mallreads=None
@@ -12,11 +12,12 @@ from cyvcf2 import cyvcf2
 import trtools.utils.common as common
 import trtools.utils.tr_harmonizer as trh
 
-from typing import List, Union, Any, Optional, Callable, Tuple
+from typing import List, Union, Any, Optional, Callable, Tuple, Dict
 
 CYVCF_RECORD = cyvcf2.Variant
 CYVCF_READER = cyvcf2.VCF
 COMPARABILITY_CALLBACK = Callable[[List[Optional[trh.TRRecord]], List[int], int], Union[bool, List[bool]]]
+CHROMS = Union[List[str], Dict[str, int]]
 
 
 def LoadReaders(vcffiles: List[str], region: Optional[str] = None) -> List[CYVCF_READER]:
@@ -139,15 +140,47 @@ def GetAndCheckVCFType(vcfs: List[CYVCF_READER], vcftype: str) -> str:
         raise ValueError("VCF files are of mixed types.")
 
 
-def GetChromOrder(r: CYVCF_RECORD, chroms: List[str]) -> Union[int, float]:
-    r"""Get the chromosome order of a record
+def GetChromIndices(chroms: List[str]) -> Dict[str, int]:
+    r"""Map each chromosome to its index in the sort order
+
+    Looking chromosomes up in this dict instead of the list
+    avoids a linear search for every record.
 
     Parameters
     ----------
-    r : vcf.Record
     chroms : list of str
        Ordered list of chromosomes
 
+    Returns
+    -------
+    chrom_indices : dict of str to int
+       The index of each chromosome in chroms
+    """
+    return {chrom: i for i, chrom in enumerate(chroms)}
+
+
+def _GetChromIndex(chrom: str, chroms: CHROMS) -> int:
+    # chroms is either the ordered list of chromosomes
+    # or its GetChromIndices dict. Either way a chromosome
+    # that isn't there raises ValueError, like list.index
+    if isinstance(chroms, dict):
+        try:
+            return chroms[chrom]
+        except KeyError:
+            raise ValueError("{!r} is not in list".format(chrom)) from None
+    return chroms.index(chrom)
+
+
+def GetChromOrder(r: CYVCF_RECORD, chroms: CHROMS) -> Union[int, float]:
+    r"""Get the chromosome order of a record
+
+    Parameters
+    ----------
+    r : vcf.Record
+    chroms : list of str or dict of str to int
+       Ordered list of chromosomes, or the dict returned
+       by GetChromIndices for that list
+
     Returns
     -------
     order : int or float
@@ -157,7 +190,7 @@ def GetChromOrder(r: CYVCF_RECORD, chroms: List[str]) -> Union[int, float]:
     if r is None:
         return np.inf
     else:
-        return chroms.index(r.CHROM)
+        return _GetChromIndex(r.CHROM, chroms)
 
 
 def GetChromOrderEqual(chrom_order: Union[int, float], min_chrom: int) -> bool:
@@ -218,7 +251,7 @@ def CheckPos(record: CYVCF_RECORD, chrom: str, pos: int) -> bool:
     return record.CHROM == chrom and record.POS == pos
 
 
-def GetMinRecords(record_list: List[Optional[trh.TRRecord]], chroms: List[str]) -> List[bool]:
+def GetMinRecords(record_list: List[Optional[trh.TRRecord]], chroms: CHROMS) -> List[bool]:
     r"""Check if each record is next up in sort order
 
     Return a vector of boolean set to true if
@@ -230,8 +263,9 @@ def GetMinRecords(record_list: List[Optional[trh.TRRecord]], chroms: List[str])
     record_list : list of CYVCF_RECORD
        list of current records from each file being merged
 
-    chroms : list of str
-       Ordered list of all chromosomes
+    chroms : list of str or dict of str to int
+       Ordered list of all chromosomes, or the dict returned
+       by GetChromIndices for that list
 
     Returns
     -------
@@ -246,7 +280,8 @@ def GetMinRecords(record_list: List[Optional[trh.TRRecord]], chroms: List[str])
         min_pos = min(allpos)
     else:
         return [False] * len(record_list)
-    return [CheckPos(r, chroms[min_chrom], min_pos) for r in record_list]
+    return [GetChromOrderEqual(chrom_order[i], min_chrom) and pos[i] == min_pos
+            for i in range(len(record_list))]
 
 
 def default_callback(records: List[trh.TRRecord], chrom_order: List[int], min_chrom_index: int) -> bool:
@@ -254,7 +289,7 @@ def default_callback(records: List[trh.TRRecord], chrom_order: List[int], min_ch
 
 
 def GetIncrementAndComparability(record_list: List[Optional[trh.TRRecord]],
-                                 chroms: List[str],
+                                 chroms: CHROMS,
                                  overlap_callback: COMPARABILITY_CALLBACK = default_callback) \
         -> Tuple[List[bool], Union[bool, List[bool]]]:
 
@@ -268,8 +303,9 @@ def GetIncrementAndComparability(record_list: List[Optional[trh.TRRecord]],
     record_list : trh.TRRecord
        list of current records from each file being merged
 
-    chroms : list of str
-       Ordered list of all chromosomes
+    chroms : list of str or dict of str to int
+       Ordered list of all chromosomes, or the dict returned
+       by GetChromIndices for that list
 
     overlap_callback: Callable[[List[Optional[trh.TRRecord]], List[int], int], Union[bool, List[bool]]
         Function that calculates whether the records are comparable
@@ -282,7 +318,7 @@ def GetIncrementAndComparability(record_list: List[Optional[trh.TRRecord]],
     comparable: bool or list of bool
         Value, that determines whether current records are comparable / mergable, depending on the callback
     """
-    chrom_order = [np.inf if r is None else chroms.index(r.chrom) for r in record_list]
+    chrom_order = [np.inf if r is None else _GetChromIndex(r.chrom, chroms) for r in record_list]
     pos = [np.inf if r is None else r.pos for r in record_list]
     min_chrom_index = min(chrom_order)
     curr_pos=[pos[i] for i in range(len(chrom_order)) if chrom_order[i]==min_chrom_index]
@@ -134,3 +134,23 @@ def test_GetRecordComparabilityAndIncrement():
 
     pair = [None, DummyHarmonizedRecord("chr1", 20)]
     assert mergeutils.GetIncrementAndComparability(pair, chromosomes, comp_callback_false) == ([False, True], False)
+
+
+def test_GetChromIndices():
+    chromosomes = ["chr1", "chr2", "chr3"]
+    chrom_indices = mergeutils.GetChromIndices(chromosomes)
+    assert chrom_indices == {"chr1": 0, "chr2": 1, "chr3": 2}
+
+    records = [None, DummyRecord("chr2", 20, "CAG"), DummyRecord("chr3", 10, "CAG"),
+               DummyRecord("chr2", 20, "CAG"), DummyRecord("chr2", 21, "CAG")]
+    for chroms in chromosomes, chrom_indices:
+        assert [mergeutils.GetChromOrder(r, chroms) for r in records] == [np.inf, 1, 2, 1, 1]
+        assert mergeutils.GetMinRecords(records, chroms) == [False, True, False, True, False]
+
+        pair = [DummyHarmonizedRecord("chr2", 20), DummyHarmonizedRecord("chr1", 20)]
+        assert mergeutils.GetIncrementAndComparability(pair, chroms) == ([False, True], True)
+
+    # contigs missing from the header raise the same error either way
+    for chroms in chromosomes, chrom_indices:
+        with pytest.raises(ValueError):
+            mergeutils.GetChromOrder(DummyRecord("chrY", 20, "CAG"), chroms)
@@ -5,7 +5,6 @@ from typing import List
 import cyvcf2
 import numpy as np
 import pytest
-from pytest import approx
 
 import trtools.utils.tr_harmonizer as trh
 
@@ -35,17 +34,22 @@ class DummyCyvcf2Record:
 
         if gts is not None:
             self.genotype = types.SimpleNamespace()
-            self._gts = np.array(gts)
+            # like cyvcf2, genotypes are int16
+            self._gts = np.array(gts, dtype=np.int16)
             self._gts = np.concatenate(
-                (self._gts, np.zeros((self._gts.shape[0], 1))),
+                (self._gts, np.zeros((self._gts.shape[0], 1), dtype=np.int16)),
                 axis=1
             ) # add the phasing axis, we're not testing that here
-            self.genotype.array = lambda: self._gts
+            self.genotype.array = lambda: self._gts.copy()
+            self.genotype.n_samples = self._gts.shape[0]
+            self.ploidy = self._gts.shape[1] - 1
         else:
             self.genotype = None
 
 
 # Set up dummy VCF records which are just lists of genotypes
+dummy_ref = "CAGCAGCAG"
+dummy_alts = ("CAGCAGCAGCAG", "CAGCAGCAGCAGCAGCAG")
 dummy_record_gts = [
     [0, 1],
     [1, 1],
@@ -56,8 +60,8 @@ dummy_record_gts = [
 def get_dummy_record():
     return DummyCyvcf2Record(
         gts=dummy_record_gts, #last sample is haploid
-        ref="CAGCAGCAG",
-        alt=("CAGCAGCAGCAG", "CAGCAGCAGCAGCAGCAG")
+        ref=dummy_ref,
+        alt=dummy_alts
     )
 
 triploid_gts = np.array([
@@ -88,6 +92,25 @@ def get_record_with_nosamples():
     )
 
 
+@pytest.fixture(scope="module")
+def dummy_trrecord():
+    dummy_record = get_dummy_record()
+    return trh.TRRecord(dummy_record, dummy_record.REF, dummy_record.ALT,
+                        "CAG", "", None)
+
+@pytest.fixture(scope="module")
+def triploid_trrecord():
+    triploid_record = get_triploid_record()
+    return trh.TRRecord(triploid_record, triploid_record.REF, [],
+                        "CAG", "", None)
+
+@pytest.fixture(scope="module")
+def nocall_trrecord():
+    nocall_record = get_nocall_record()
+    return trh.TRRecord(nocall_record, nocall_record.REF, [],
+                        "CAG", "", None)
+
+
 def test_unexpected_vcf_type():
     with pytest.raises(ValueError):
         trh._UnexpectedTypeError(trh.VcfTypes.gangstr)  # pylint: disable=W0212
@@ -137,6 +160,17 @@ def test_TRRecord_print():
                            .format(ID, motif))
 
 
+# str only depends on the alleles, so one check per genotype scenario
+@pytest.mark.parametrize("record, true_str", [
+    ("dummy_trrecord", " CAG {} {}".format(dummy_ref, ",".join(dummy_alts))),
+    ("triploid_trrecord", " CAG CAGCAGCAG ."),
+    ("nocall_trrecord", " CAG CAGCAGCAG ."),
+])
+def test_TRRecord_str(request, record, true_str):
+    rec = request.getfixturevalue(record)
+    assert str(rec) == true_str
+
+
 def test_TRRecord_output_shape():
     rec = get_dummy_record()
     record = trh.TRRecord(rec, rec.REF, rec.ALT,
@@ -261,12 +295,11 @@ def test_TRRecord_full_alleles():
     }
 
 
-def test_TRRecord_GetGenotypes():
-    dummy_record = get_dummy_record()
+def test_TRRecord_GetGenotypes(dummy_trrecord, triploid_trrecord):
     # Test good example
-    ref_allele = dummy_record.REF
-    alt_alleles = dummy_record.ALT
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
+    rec = dummy_trrecord
+    ref_allele = rec.ref_allele
+    alt_alleles = rec.alt_alleles
     true_gts = [[ref_allele, alt_alleles[0]],
                 [alt_alleles[0], alt_alleles[0]],
                 [alt_alleles[0], alt_alleles[0]],
@@ -275,14 +308,13 @@ def test_TRRecord_GetGenotypes():
                 [ref_allele, '.']]
     true_gts = np.array(true_gts)
     true_len_gts = np.array([[3, 4], [4, 4], [4, 4], [4, 6], [6, 6], [3, -1]])
-    assert np.all(rec.GetGenotypeIndicies()[:, :-1] ==
-                  np.array(dummy_record_gts))
-    assert np.all(rec.GetLengthGenotypes()[:, :-1] == true_len_gts)
-    assert np.all(rec.GetStringGenotypes()[:, :-1] == true_gts)
+    assert np.array_equal(rec.GetGenotypeIndicies()[:, :-1],
+                          dummy_record_gts)
+    assert np.array_equal(rec.GetLengthGenotypes()[:, :-1], true_len_gts)
+    assert np.array_equal(rec.GetStringGenotypes()[:, :-1], true_gts)
 
     # Test example where alt=[]
-    triploid_record = get_triploid_record()
-    rec = trh.TRRecord(triploid_record, ref_allele, [], "CAG", "", None)
+    rec = triploid_trrecord
     true_len_gts = [[3, 3, -2],
                 [3, 3, -2],
                 [3, 3, -2],
@@ -299,293 +331,233 @@ def test_TRRecord_GetGenotypes():
                 [ref_allele, ref_allele, ref_allele]]
     true_gts = np.array(true_gts)
 
-    assert np.all(rec.GetGenotypeIndicies()[:, :-1] == true_idx_gts)
-    assert np.all(rec.GetLengthGenotypes()[:, :-1] == true_len_gts)
-    assert np.all(rec.GetStringGenotypes()[:, :-1] == true_gts)
+    assert np.array_equal(rec.GetGenotypeIndicies()[:, :-1], true_idx_gts)
+    assert np.array_equal(rec.GetLengthGenotypes()[:, :-1], true_len_gts)
+    assert np.array_equal(rec.GetStringGenotypes()[:, :-1], true_gts)
 
     # Test example with fewer alt_alleles than the max genotype index
     with pytest.raises(ValueError):
-        trh.TRRecord(dummy_record, ref_allele, [], "CAG", "", None)
+        trh.TRRecord(get_dummy_record(), ref_allele, [], "CAG", "", None)
 
 
 def _dicts_equal(dict1, dict2):
     return (all(k in dict2 and v == dict2[k] for k,v in dict1.items()) and
             len(dict1) == len(dict2))
 
-def test_GetGenotypeCounts():
+ref, alt1, alt2 = dummy_ref, *dummy_alts
+
+@pytest.mark.parametrize(
+    "record, sample_index, idx_counts, len_counts, str_counts", [
     # Test working example, no sample_index,
     # also a call with a missing haplotype
-    dummy_record = get_dummy_record()
-    ref_allele = dummy_record.REF
-    alt_alleles = dummy_record.ALT
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
-    true_idx_gt_counts = {(0, 1) : 1,
-                          (1, 1) : 2,
-                          (1, 2) : 1,
-                          (2, 2) : 1}
-    true_gt_counts = {(ref_allele, alt_alleles[0]): 1,
-                      (alt_alleles[0], alt_alleles[0]): 2,
-                      (alt_alleles[0], alt_alleles[1]): 1,
-                      (alt_alleles[1], alt_alleles[1]): 1}
-    true_len_gt_counts = {
-        (3, 4): 1,
-        (4, 4): 2,
-        (4, 6): 1,
-        (6, 6): 1
-    }
-
-    gt_counts_uselength = rec.GetGenotypeCounts()
-    gt_counts_nolength = rec.GetGenotypeCounts(uselength=False)
-    gt_counts_idx = rec.GetGenotypeCounts(index=True)
-    assert _dicts_equal(true_idx_gt_counts, gt_counts_idx)
-    assert _dicts_equal(true_len_gt_counts, gt_counts_uselength)
-    assert _dicts_equal(true_gt_counts, gt_counts_nolength)
-
+    ("dummy_trrecord", None,
+     {(0, 1): 1, (1, 1): 2, (1, 2): 1, (2, 2): 1},
+     {(3, 4): 1, (4, 4): 2, (4, 6): 1, (6, 6): 1},
+     {(ref, alt1): 1, (alt1, alt1): 2, (alt1, alt2): 1, (alt2, alt2): 1}),
     # Test example where alt=[]
-    triploid_record = get_triploid_record()
-    rec = trh.TRRecord(triploid_record, ref_allele, [], "CAG", "", None)
-    true_idx_gt_counts = {(0, 0, 0): 1, (-2, 0, 0): 3}
-    true_len_gt_counts = {(3, 3, 3): 1, (-2, 3, 3): 3}
-    true_gt_counts = {(ref_allele, ref_allele, ref_allele): 1,
-                      (',', ref_allele, ref_allele): 3}
-    gt_counts_idx = rec.GetGenotypeCounts(index=True)
-    gt_counts_uselength = rec.GetGenotypeCounts()
-    gt_counts_nolength = rec.GetGenotypeCounts(uselength=False)
-    assert _dicts_equal(true_idx_gt_counts, gt_counts_idx)
-    assert _dicts_equal(true_len_gt_counts, gt_counts_uselength)
-    assert _dicts_equal(true_gt_counts, gt_counts_nolength)
-
-    # Test example where there are no samples
-    rec = trh.TRRecord(get_nocall_record(), ref_allele, [], "CAG", "", None)
+    ("triploid_trrecord", None,
+     {(0, 0, 0): 1, (-2, 0, 0): 3},
+     {(3, 3, 3): 1, (-2, 3, 3): 3},
+     {(ref, ref, ref): 1, (',', ref, ref): 3}),
+    # Test example where there are no called samples
+    ("nocall_trrecord", None, {}, {}, {}),
+    # Test working example with sample_index
+    ("dummy_trrecord", [0, 2, 5],
+     {(0, 1): 1, (1, 1): 1},
+     {(3, 4): 1, (4, 4): 1},
+     {(ref, alt1): 1, (alt1, alt1): 1}),
+])
+def test_GetGenotypeCounts(request, record, sample_index,
+                           idx_counts, len_counts, str_counts):
+    rec = request.getfixturevalue(record)
+    assert _dicts_equal(idx_counts, rec.GetGenotypeCounts(
+        sample_index=sample_index, index=True))
+    assert _dicts_equal(len_counts, rec.GetGenotypeCounts(
+        sample_index=sample_index))
+    assert _dicts_equal(str_counts, rec.GetGenotypeCounts(
+        sample_index=sample_index, uselength=False))
+
+
+def test_GetGenotypeCounts_nocalls(nocall_trrecord):
+    rec = nocall_trrecord
     # expect a entry for counting no-calls
-    assert len(rec.GetGenotypeCounts(index=True)) == 0
-    assert len(rec.GetGenotypeCounts()) == 0
-    assert len(rec.GetGenotypeCounts(uselength=True)) == 0
     assert len(rec.GetGenotypeCounts(index=True, include_nocalls=True)) == 1
     assert len(rec.GetGenotypeCounts(include_nocalls=True)) == 1
     assert len(rec.GetGenotypeCounts(uselength=True, include_nocalls=True)) == 1
 
-    # Test working example with sample_index
-    true_idx_gt_counts_sindex = {(0, 1): 1, (1, 1): 1}
-    true_gt_counts_sindex = {(ref_allele, alt_alleles[0]): 1,
-                            (alt_alleles[0], alt_alleles[0]): 1}
-    true_len_gt_counts_sindex = {(3, 4): 1, (4, 4): 1}
-    sindex = [0, 2, 5]
-    dummy_record = get_dummy_record()
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
-    gt_counts_idx_sindex = rec.GetGenotypeCounts(sample_index=sindex, index=True)
-    gt_counts_uselength_sindex = rec.GetGenotypeCounts(sample_index=sindex)
-    gt_counts_nolength_sindex = rec.GetGenotypeCounts(sample_index=sindex,
-                                                     uselength=False)
-    assert _dicts_equal(true_idx_gt_counts_sindex, gt_counts_idx_sindex)
-    assert _dicts_equal(true_len_gt_counts_sindex, gt_counts_uselength_sindex)
-    assert _dicts_equal(true_gt_counts_sindex, gt_counts_nolength_sindex)
 
+def test_CountGenotypeRows():
+    gts = np.sort(np.array(dummy_record_gts), axis=1)
+    genotypes, counts = trh._CountGenotypeRows(gts, 3)  # pylint: disable=W0212
+    true_genotypes, true_counts = np.unique(gts, axis=0, return_counts=True)
+    assert np.array_equal(genotypes, true_genotypes)
+    assert np.array_equal(counts, true_counts)
 
-def test_GetAlleleCounts():
-    # Test working example, no sample_index
-    dummy_record = get_dummy_record()
-    ref_allele = dummy_record.REF
-    alt_alleles = dummy_record.ALT
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
-    true_al_counts = {ref_allele: 2, alt_alleles[0]: 6, alt_alleles[1]: 3}
-    true_len_al_counts = {3: 2, 4: 6, 6: 3}
-    true_idx_al_counts = {0: 2, 1: 6, 2: 3}
-
-    al_counts_uselength = rec.GetAlleleCounts()
-    al_counts_nolength = rec.GetAlleleCounts(uselength=False)
-    al_counts_idx = rec.GetAlleleCounts(index=True)
-    assert _dicts_equal(true_idx_al_counts, al_counts_idx)
-    assert _dicts_equal(true_len_al_counts, al_counts_uselength)
-    assert _dicts_equal(true_al_counts, al_counts_nolength)
+    # too many possible keys to tally them densely
+    gts = np.sort(np.array([[0, 299, 299], [0, 299, 299], [-2, 3, 7]]), axis=1)
+    genotypes, counts = trh._CountGenotypeRows(gts, 300)  # pylint: disable=W0212
+    true_genotypes, true_counts = np.unique(gts, axis=0, return_counts=True)
+    assert np.array_equal(genotypes, true_genotypes)
+    assert np.array_equal(counts, true_counts)
+
+    # too many alleles to pack each genotype into an int64
+    gts = np.sort(np.array([[0, 1, 299, -2] * 4, [0, 1, 299, -2] * 4,
+                            [5, 5, 5, 5] * 4]), axis=1)
+    genotypes, counts = trh._CountGenotypeRows(gts, 300)  # pylint: disable=W0212
+    true_genotypes, true_counts = np.unique(gts, axis=0, return_counts=True)
+    assert np.array_equal(genotypes, true_genotypes)
+    assert np.array_equal(counts, true_counts)
 
-    # Test example where alt=[]
-    rec = trh.TRRecord(get_triploid_record(), ref_allele, [], "CAG", "", None)
-    true_len_al_counts = {3: 9}
-    true_idx_al_counts = {0: 9}
-    true_al_counts = {ref_allele: 9}
-    al_counts_idx = rec.GetAlleleCounts(index=True)
-    al_counts_uselength = rec.GetAlleleCounts()
-    al_counts_nolength = rec.GetAlleleCounts(uselength=False)
-    assert _dicts_equal(true_idx_al_counts, al_counts_idx)
-    assert _dicts_equal(true_len_al_counts, al_counts_uselength)
-    assert _dicts_equal(true_al_counts, al_counts_nolength)
-
-    # Test example where there are no samples
-    rec = trh.TRRecord(get_nocall_record(), ref_allele, [], "CAG", "", None)
-    assert len(rec.GetAlleleCounts(index=True)) == 0
-    assert len(rec.GetAlleleCounts()) == 0
-    assert len(rec.GetAlleleCounts(uselength=True)) == 0
 
+@pytest.mark.parametrize(
+    "record, sample_index, idx_counts, len_counts, str_counts", [
+    # Test working example, no sample_index
+    ("dummy_trrecord", None,
+     {0: 2, 1: 6, 2: 3},
+     {3: 2, 4: 6, 6: 3},
+     {ref: 2, alt1: 6, alt2: 3}),
+    # Test example where alt=[]
+    ("triploid_trrecord", None, {0: 9}, {3: 9}, {ref: 9}),
+    # Test example where there are no called samples
+    ("nocall_trrecord", None, {}, {}, {}),
     # Test working example with sample_index
+    ("dummy_trrecord", [0, 2, 5],
+     {0: 2, 1: 3},
+     {3: 2, 4: 3},
+     {ref: 2, alt1: 3}),
+])
+def test_GetAlleleCounts(request, record, sample_index,
+                         idx_counts, len_counts, str_counts):
+    rec = request.getfixturevalue(record)
+    assert _dicts_equal(idx_counts, rec.GetAlleleCounts(
+        sample_index=sample_index, index=True))
+    assert _dicts_equal(len_counts, rec.GetAlleleCounts(
+        sample_index=sample_index))
+    assert _dicts_equal(str_counts, rec.GetAlleleCounts(
+        sample_index=sample_index, uselength=False))
+
+
+def test_GetAlleleCounts_cached(dummy_trrecord):
+    rec = dummy_trrecord
     true_idx_al_counts_sindex = {0: 2, 1: 3}
     true_len_al_counts_sindex = {3: 2, 4: 3}
-    true_al_counts_sindex = {ref_allele: 2, alt_alleles[0]: 3}
     sindex = [0, 2, 5]
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
     al_counts_idx_sindex = rec.GetAlleleCounts(sample_index=sindex, index=True)
     al_counts_uselength_sindex = rec.GetAlleleCounts(sample_index=sindex)
-    al_counts_nolength_sindex = rec.GetAlleleCounts(sample_index=sindex,
-                                                   uselength=False)
-    assert _dicts_equal(true_idx_al_counts_sindex, al_counts_idx_sindex)
-    assert _dicts_equal(true_len_al_counts_sindex, al_counts_uselength_sindex)
-    assert _dicts_equal(true_al_counts_sindex, al_counts_nolength_sindex)
-
 
-def test_GetAlleleFreqs():
+    # Counts are cached per record, make sure modifying the returned
+    # dicts doesn't affect later calls
+    al_counts_idx_sindex[3] = 0
+    al_counts_uselength_sindex.clear()
+    assert _dicts_equal(true_idx_al_counts_sindex,
+                        rec.GetAlleleCounts(sample_index=sindex, index=True))
+    assert _dicts_equal(true_len_al_counts_sindex,
+                        rec.GetAlleleCounts(sample_index=np.array(sindex)))
+    bool_sindex = np.zeros(rec.GetNumSamples(), dtype=bool)
+    bool_sindex[sindex] = True
+    assert _dicts_equal(true_len_al_counts_sindex,
+                        rec.GetAlleleCounts(sample_index=bool_sindex))
+    assert _dicts_equal({3: 2, 4: 6, 6: 3},
+                        rec.GetAlleleCounts(sample_index=slice(None)))
+
+
+@pytest.mark.parametrize(
+    "record, sample_index, idx_freqs, len_freqs, str_freqs", [
     # Test working example, no sample_index
-    dummy_record = get_dummy_record()
-    ref_allele = dummy_record.REF
-    alt_alleles = dummy_record.ALT
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
-    true_al_freqs = {
-        ref_allele: 0.1818181,
-        alt_alleles[0]: 0.5454545,
-        alt_alleles[1]: 0.2727272
-    }
-    true_len_al_freqs = {3: 0.1818181, 4: 0.5454545, 6: 0.2727272}
-    true_idx_al_freqs = {0: 0.1818181, 1: 0.5454545, 2: 0.2727272}
-
-    al_freqs_uselength = rec.GetAlleleFreqs()
-    al_freqs_nolength = rec.GetAlleleFreqs(uselength=False)
-    al_freqs_idx = rec.GetAlleleFreqs(index=True)
-    assert (all(
-        v == approx(true_idx_al_freqs[k]) for k, v in al_freqs_idx.items()
-    ) and len(al_freqs_idx) == len(true_idx_al_freqs))
-    assert (all(
-        v == approx(true_len_al_freqs[k]) for k, v in al_freqs_uselength.items()
-    ) and len(al_freqs_uselength) == len(true_len_al_freqs))
-    assert (all(
-        v == approx(true_al_freqs[k]) for k, v in al_freqs_nolength.items()
-    ) and len(al_freqs_nolength) == len(true_al_freqs))
-
+    ("dummy_trrecord", None,
+     {0: 2/11, 1: 6/11, 2: 3/11},
+     {3: 2/11, 4: 6/11, 6: 3/11},
+     {ref: 2/11, alt1: 6/11, alt2: 3/11}),
     # Test example where alt=[]
-    rec = trh.TRRecord(get_triploid_record(), ref_allele, [], "CAG", "", None)
-    true_len_al_freq = {3: 1}
-    true_idx_al_freq = {0: 1}
-    true_al_freq = {ref_allele: 1}
-    al_freq_idx = rec.GetAlleleFreqs(index=True)
-    al_freq_uselength = rec.GetAlleleFreqs()
-    al_freq_nolength = rec.GetAlleleFreqs(uselength=False)
-    assert (all(
-        v == true_idx_al_freq[k] for k, v in al_freq_idx.items()
-    ) and len(al_freq_idx) == len(true_idx_al_freq))
-    assert (all(
-        v == true_len_al_freq[k] for k, v in al_freq_uselength.items()
-    ) and len(al_freq_uselength) == len(true_len_al_freq))
-    assert (all(
-        v == true_al_freq[k] for k, v in al_freq_nolength.items()
-    ) and len(al_freq_nolength) == len(true_al_freq))
-
-    # Test example where there are no samples
-    rec = trh.TRRecord(get_nocall_record(), ref_allele, [], "CAG", "", None)
-    assert len(rec.GetAlleleFreqs(index=True)) == 0
-    assert len(rec.GetAlleleFreqs()) == 0
-    assert len(rec.GetAlleleFreqs(uselength=True)) == 0
-
+    ("triploid_trrecord", None, {0: 1}, {3: 1}, {ref: 1}),
+    # Test example where there are no called samples
+    ("nocall_trrecord", None, {}, {}, {}),
     # Test working example with sample_index
-    true_idx_al_freqs_sindex = {0: 0.4, 1: 0.6}
-    true_len_al_freqs_sindex = {3: 0.4, 4: 0.6}
-    true_al_freqs_sindex = {ref_allele: 0.4, alt_alleles[0]: 0.6}
-    sindex = [0, 2, 5]
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
-    al_freqs_idx_sindex = rec.GetAlleleFreqs(sample_index=sindex, index=True)
-    al_freqs_uselength_sindex = rec.GetAlleleFreqs(sample_index=sindex)
-    al_freqs_nolength_sindex = rec.GetAlleleFreqs(sample_index=sindex,
-                                                 uselength=False)
-    assert (all(
-        v == true_idx_al_freqs_sindex[k] for k, v in
-        al_freqs_idx_sindex.items()
-    ) and len(al_freqs_idx_sindex) == len(true_idx_al_freqs_sindex))
-    assert (all(
-        v == true_len_al_freqs_sindex[k] for k, v in
-        al_freqs_uselength_sindex.items()
-    ) and len(al_freqs_uselength_sindex) == len(true_len_al_freqs_sindex))
-    assert (all(
-        v == true_al_freqs_sindex[k] for k, v
-        in al_freqs_nolength_sindex.items()
-    ) and len(al_freqs_nolength_sindex) == len(true_al_freqs_sindex))
-
-
-def test_GetMaxAllele():
+    ("dummy_trrecord", [0, 2, 5],
+     {0: 0.4, 1: 0.6},
+     {3: 0.4, 4: 0.6},
+     {ref: 0.4, alt1: 0.6}),
+])
+def test_GetAlleleFreqs(request, record, sample_index,
+                        idx_freqs, len_freqs, str_freqs):
+    rec = request.getfixturevalue(record)
+    assert _dicts_equal(idx_freqs, rec.GetAlleleFreqs(
+        sample_index=sample_index, index=True))
+    assert _dicts_equal(len_freqs, rec.GetAlleleFreqs(
+        sample_index=sample_index))
+    assert _dicts_equal(str_freqs, rec.GetAlleleFreqs(
+        sample_index=sample_index, uselength=False))
+
+
+@pytest.mark.parametrize("record, sample_index, true_al_max", [
     # Test working example
-    dummy_record = get_dummy_record()
-    ref_allele = dummy_record.REF
-    alt_alleles = dummy_record.ALT
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
-    true_al_max = 6
-    al_max = rec.GetMaxAllele()
-    assert al_max == true_al_max
-
+    ("dummy_trrecord", None, 6),
     # Test example where alt=[]
-    rec = trh.TRRecord(get_triploid_record(), ref_allele, [], "CAG", "", None)
-    true_al_max = 3
-    al_max = rec.GetMaxAllele()
-    assert al_max == true_al_max
-
+    ("triploid_trrecord", None, 3),
     # Test example where there are no called samples
-    rec = trh.TRRecord(get_nocall_record(), ref_allele, [], "CAG", "", None)
-    true_al_max = np.nan
-    al_max = rec.GetMaxAllele()
-    assert np.isnan(al_max)
-
+    ("nocall_trrecord", None, np.nan),
     # Test working example with sample_index
-    sindex = [0, 2, 5]
-    true_al_max_sindex = 4
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
-    al_max_sindex = rec.GetMaxAllele(sample_index=sindex)
-    assert al_max_sindex == true_al_max_sindex
-
-
-def test_GetCalledSamples():
-    dummy_record = get_dummy_record()
-    ref_allele = dummy_record.REF
-    alt_alleles = dummy_record.ALT
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
+    ("dummy_trrecord", [0, 2, 5], 4),
+])
+def test_GetMaxAllele(request, record, sample_index, true_al_max):
+    rec = request.getfixturevalue(record)
+    al_max = rec.GetMaxAllele(sample_index=sample_index)
+    if np.isnan(true_al_max):
+        assert np.isnan(al_max)
+    else:
+        assert al_max == true_al_max
+
+
+def test_GetNumSamples_GetMaxPloidy(dummy_trrecord, triploid_trrecord,
+                                    nocall_trrecord):
+    assert dummy_trrecord.GetNumSamples() == 6
+    assert dummy_trrecord.GetMaxPloidy() == 2
+    assert triploid_trrecord.GetNumSamples() == 4
+    assert triploid_trrecord.GetMaxPloidy() == 3
+    assert nocall_trrecord.GetNumSamples() == 1
+    assert nocall_trrecord.GetMaxPloidy() == 2
+
+
+def test_GetCalledSamples(dummy_trrecord, triploid_trrecord, nocall_trrecord):
+    rec = dummy_trrecord
     assert np.all(rec.GetCalledSamples() == [True] * 5 + [False])
     assert np.all(rec.GetCalledSamples(strict=False))
 
     # Test differences in ploidy
-    rec = trh.TRRecord(get_triploid_record(), ref_allele, [], "CAG", "", None)
+    rec = triploid_trrecord
     assert np.all(rec.GetCalledSamples(strict=True))
 
     # Test a true no call
-    rec = trh.TRRecord(get_nocall_record(), ref_allele, [], "CAG", "", None)
+    rec = nocall_trrecord
     assert np.all(~rec.GetCalledSamples())
 
 
-def test_GetSamplePloidies():
+def test_GetSamplePloidies(dummy_trrecord, triploid_trrecord, nocall_trrecord):
     # All samples have the same ploidy
     # even a partial nocall
-    dummy_record = get_dummy_record()
-    ref_allele = dummy_record.REF
-    alt_alleles = dummy_record.ALT
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
+    rec = dummy_trrecord
     assert np.all(rec.GetSamplePloidies() == 2)
 
     # Test differences in ploidy
-    rec = trh.TRRecord(get_triploid_record(), ref_allele, [], "CAG", "", None)
+    rec = triploid_trrecord
     assert np.all(rec.GetSamplePloidies() == [2,2,2,3])
 
     # Test a no call, sample ploidy should not change
-    rec = trh.TRRecord(get_nocall_record(), ref_allele, [], "CAG", "", None)
+    rec = nocall_trrecord
     assert np.all(rec.GetSamplePloidies() == 2)
 
 
-def test_GetCallRate():
-    dummy_record = get_dummy_record()
-    ref_allele = dummy_record.REF
-    alt_alleles = dummy_record.ALT
-    rec = trh.TRRecord(dummy_record, ref_allele, alt_alleles, "CAG", "", None)
+def test_GetCallRate(dummy_trrecord, triploid_trrecord, nocall_trrecord):
+    rec = dummy_trrecord
     assert rec.GetCallRate() == pytest.approx(5/6)
     assert rec.GetCalledSamples(strict=False) == pytest.approx(1)
 
     # Test differences in ploidy
-    rec = trh.TRRecord(get_triploid_record(), ref_allele, [], "CAG", "", None)
+    rec = triploid_trrecord
     assert rec.GetCalledSamples(strict=True) == pytest.approx(1)
 
     # Test a true no call
-    rec = trh.TRRecord(get_nocall_record(), ref_allele, [], "CAG", "", None)
+    rec = nocall_trrecord
     assert rec.GetCalledSamples(strict=False) == pytest.approx(0)
 
 
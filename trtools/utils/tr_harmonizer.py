@@ -538,6 +538,55 @@ def _UpperCaseAlleles(alleles: List[str]):
     return upper_alleles
 
 
+# Largest number of possible genotype keys for which
+# _CountGenotypeRows tallies keys in a dense array
+_MAX_BINCOUNT_KEYS = 2 ** 16
+
+
+def _CountGenotypeRows(idx_gts: np.ndarray, n_alleles: int):
+    # Count the distinct rows of an array of (sorted) genotype indicies.
+    #
+    # Equivalent to np.unique(idx_gts, axis=0, return_counts=True),
+    # but each row is first packed into a single integer key
+    # (a base n_alleles + 2 number, after shifting -2 and -1 to 0 and 1)
+    # so the sort is done on one int64 column instead of on whole rows.
+    # Most significant digits come first, so the rows are returned in the
+    # same order as np.unique would return them.
+    # When there are few possible keys (the common case of a diploid
+    # record with a handful of alleles) they are tallied with
+    # np.bincount instead of being sorted.
+    ploidy = idx_gts.shape[1]
+    base = n_alleles + 2
+    n_keys = base ** ploidy
+    if n_keys > np.iinfo(np.int64).max:
+        # keys wouldn't fit in an int64, count rows directly
+        return np.unique(idx_gts, axis=0, return_counts=True)
+
+    powers = base ** np.arange(ploidy - 1, -1, -1, dtype=np.int64)
+    packed = (idx_gts + 2) @ powers
+    if n_keys <= _MAX_BINCOUNT_KEYS:
+        counts = np.bincount(packed, minlength=n_keys)
+        keys = np.flatnonzero(counts)
+        counts = counts[keys]
+    else:
+        keys, counts = np.unique(packed, return_counts=True)
+    genotypes = (keys[:, np.newaxis] // powers) % base - 2
+    return genotypes, counts
+
+
+def _SampleIndexCacheKey(sample_index: Optional[Any]):
+    # Build a hashable key identifying the samples selected by
+    # a sample_index argument (see TRRecord.GetAlleleCounts).
+    # Returns None if sample_index can't be turned into such a key
+    # (e.g. a slice) in which case results should not be cached.
+    if sample_index is None:
+        return 'all'
+    sample_index = np.asarray(sample_index)
+    if sample_index.dtype == object:
+        return None
+    return (sample_index.dtype.str, sample_index.shape, sample_index.tobytes())
+
+
 class _Cyvcf2FormatDict():
     """
     Provide an immutable dict-like interface for accessing
@@ -694,6 +743,11 @@ class TRRecord:
         self.alt_allele_lengths = alt_allele_lengths
         self.quality_field = quality_field
         self.quality_score_transform = quality_score_transform
+        self._gt_idxs = None
+        self._called_samples = {}
+        self._sample_ploidies = None
+        self._allele_codes = {}
+        self._allele_counts_cache = {}
 
         if full_alleles is not None and (alt_alleles is None or ref_allele is
                                          None):
@@ -734,14 +788,28 @@ class TRRecord:
                 len(allele) / len(motif) for allele in self.alt_alleles
             ]
 
-
-
         try:
             self._CheckRecord()
         except ValueError as e:
             raise ValueError(("Invalid TRRecord. TRRecord: {} Original record:"
                               " {}").format(str(self), str(self.vcfrecord)), e)
 
+        # per allele lookup tables, indexed by genotype index.
+        # The final two entries stand in for -2 (lower ploidy)
+        # and -1 (no call) haplotypes
+        self._allele_lengths = np.array(
+            [self.ref_allele_length, *self.alt_allele_lengths, -2, -1]
+        )
+        self._allele_strings = np.array(
+            [self.ref_allele, *self.alt_alleles, ',', '.']
+        )
+        if full_alleles is not None:
+            self._full_allele_strings = np.array(
+                [full_alleles[0], *full_alleles[1], ',', '.']
+            )
+        else:
+            self._full_allele_strings = self._allele_strings
+
     def _CheckRecord(self):
         """
         Check that this record is properly constructed.
@@ -827,9 +895,19 @@ class TRRecord:
             If there are no samples in the vcf this record comes from
             then return None instead
         """
-        if self.vcfrecord.genotype is None:
+        gt_idxs = self._GetGenotypeIndexArray()
+        if gt_idxs is None:
             return None
-        return self.vcfrecord.genotype.array().astype(int)
+        return gt_idxs.astype(int)
+
+    def _GetGenotypeIndexArray(self) -> Optional[np.ndarray]:
+        # Same as GetGenotypeIndicies, but the array is only pulled out of
+        # the underlying record once and then shared between calls.
+        # It is kept in the dtype cyvcf2 hands out (int16) instead of
+        # being widened to int. Callers must not modify the returned array.
+        if self._gt_idxs is None and self.vcfrecord.genotype is not None:
+            self._gt_idxs = self.vcfrecord.genotype.array()
+        return self._gt_idxs
 
     def GetCalledSamples(self, strict: bool = True) -> Optional[np.ndarray]:
         """
@@ -855,16 +933,28 @@ class TRRecord:
             If there are no samples in the vcf this record comes from
             then return None instead
         """
-        gt_idxs = self.GetGenotypeIndicies()
-        if gt_idxs is None:
+        called_samples = self._GetCalledSampleMask(strict)
+        if called_samples is None:
             return None
-
-        if strict:
-            return ~np.any(gt_idxs[:, :-1] == -1, axis=1)
-        else:
-            return ~np.all(np.logical_or(gt_idxs[:, :-1] == -1,
-                                         gt_idxs[:, :-1] == -2),
-                           axis=1)
+        return called_samples.copy()
+
+    def _GetCalledSampleMask(self, strict: bool) -> Optional[np.ndarray]:
+        # Same as GetCalledSamples, but only computed once per value of
+        # strict and then shared between calls.
+        # Callers must not modify the returned array.
+        if strict not in self._called_samples:
+            gt_idxs = self._GetGenotypeIndexArray()
+            if gt_idxs is None:
+                return None
+
+            if strict:
+                called_samples = ~np.any(gt_idxs[:, :-1] == -1, axis=1)
+            else:
+                called_samples = ~np.all(np.logical_or(gt_idxs[:, :-1] == -1,
+                                                       gt_idxs[:, :-1] == -2),
+                                         axis=1)
+            self._called_samples[strict] = called_samples
+        return self._called_samples[strict]
 
     def GetSamplePloidies(self) -> Optional[np.ndarray]:
         """
@@ -880,13 +970,23 @@ class TRRecord:
             If there are no samples in the vcf this record comes from
             then return None instead
         """
-        gt_idxs = self.GetGenotypeIndicies()
-        if gt_idxs is None:
+        ploidies = self._GetSamplePloidyArray()
+        if ploidies is None:
             return None
-
-        return (
-                gt_idxs.shape[1] - 1 - np.sum(gt_idxs[:, :-1] == -2, axis=1)
-        )
+        return ploidies.copy()
+
+    def _GetSamplePloidyArray(self) -> Optional[np.ndarray]:
+        # Same as GetSamplePloidies, but only computed once and then
+        # shared between calls. Callers must not modify the returned array.
+        if self._sample_ploidies is None:
+            gt_idxs = self._GetGenotypeIndexArray()
+            if gt_idxs is None:
+                return None
+
+            self._sample_ploidies = (
+                    gt_idxs.shape[1] - 1 - np.sum(gt_idxs[:, :-1] == -2, axis=1)
+            )
+        return self._sample_ploidies
 
     def GetCallRate(self, strict: bool = True) -> float:
         """
@@ -909,7 +1009,7 @@ class TRRecord:
             called. If there are no samples in the vcf this record comes from
             then return np.nan instead
         """
-        called_samples = self.GetCalledSamples(strict=strict)
+        called_samples = self._GetCalledSampleMask(strict)
         if called_samples is None:
             return None
         else:
@@ -918,16 +1018,12 @@ class TRRecord:
     def _GetStringGenotypeArray(
             self,
             idx_gts: np.ndarray,
-            seq_alleles: List[str]):
+            seq_alleles: np.ndarray):
 
-        max_len = max(len(allele) for allele in seq_alleles)
-        seq_array = np.empty(idx_gts.shape, dtype="<U{}".format(max_len))
+        seq_array = np.empty(idx_gts.shape, dtype=seq_alleles.dtype)
         seq_array[:, -1][idx_gts[:, -1] == 0] = '0'
         seq_array[:, -1][idx_gts[:, -1] == 1] = '1'
-        for allele_idx, seq_allele in enumerate(seq_alleles):
-            seq_array[:, :-1][idx_gts[:, :-1] == allele_idx] = seq_allele
-        seq_array[:, :-1][idx_gts[:, :-1] == -1] = '.'
-        seq_array[:, :-1][idx_gts[:, :-1] == -2] = ','
+        seq_array[:, :-1] = seq_alleles[idx_gts[:, :-1]]
         return seq_array
 
     def GetStringGenotypes(self) -> Optional[np.ndarray]:
@@ -971,7 +1067,7 @@ class TRRecord:
             If there are no samples in the vcf this record comes from
             then return None instead
         """
-        idx_gts = self.GetGenotypeIndicies()
+        idx_gts = self._GetGenotypeIndexArray()
         if idx_gts is None:
             return None
 
@@ -981,10 +1077,8 @@ class TRRecord:
                           "generates length genotypes, not string genotypes"
                           ". Returning a fabricated string genotype. Consider"
                           " requesting length based genotypes instead.")
-        seq_alleles = list(self.alt_alleles)
-        seq_alleles.insert(0, self.ref_allele)
 
-        return self._GetStringGenotypeArray(idx_gts, seq_alleles)
+        return self._GetStringGenotypeArray(idx_gts, self._allele_strings)
 
     def GetFullStringGenotypes(self) -> Optional[np.ndarray]:
         """
@@ -1007,14 +1101,11 @@ class TRRecord:
         if not self.HasFullStringGenotypes():
             return self.GetStringGenotypes()
 
-        idx_gts = self.GetGenotypeIndicies()
+        idx_gts = self._GetGenotypeIndexArray()
         if idx_gts is None:
             return None
 
-        full_seq_alleles = self.full_alleles[1].copy()
-        full_seq_alleles.insert(0, self.full_alleles[0])
-
-        return self._GetStringGenotypeArray(idx_gts, full_seq_alleles)
+        return self._GetStringGenotypeArray(idx_gts, self._full_allele_strings)
 
     def UniqueStringGenotypeMapping(self) -> Dict[int, int]:
         """
@@ -1088,16 +1179,12 @@ class TRRecord:
             If there are no samples in the vcf this record comes from
             then return None instead
         """
-        idx_gts = self.GetGenotypeIndicies()
+        idx_gts = self._GetGenotypeIndexArray()
         if idx_gts is None:
             return None
 
-        # store allele lengths in a numpy array
-        # and add fake alleles for -2 and -1 missing values
-        allele_lens = np.array([self.ref_allele_length, *self.alt_allele_lengths, -2, -1])
-
         # copy repeats lengths and phasing for each sample
-        len_gts = allele_lens[idx_gts]
+        len_gts = self._allele_lengths[idx_gts]
         len_gts[:, -1] = idx_gts[:, -1]
 
         return len_gts
@@ -1181,6 +1268,51 @@ class TRRecord:
         """
         return self.has_fabricated_alt_alleles
 
+    def _GetAlleleCodes(
+            self,
+            uselength: bool,
+            index: bool,
+            fullgenotypes: bool) -> Tuple[np.ndarray, np.ndarray]:
+        # Get integer codes for the distinct alleles of this record, as
+        # represented according to uselength, index and fullgenotypes
+        # (see GetGenotypeCounts). Returns (codes, alleles) where
+        # codes[i] is the code of the allele with genotype index i and
+        # alleles[code] is that allele's representation.
+        # Codes are numbered in the sorted order of the representations.
+        # Both arrays end with entries for -2 (lower ploidy) and -1
+        # (no call) haplotypes, so codes can be indexed directly with
+        # genotype indicies and keep those two values unchanged.
+        if uselength and fullgenotypes:
+            raise ValueError("Can't specify both uselength and fullgenotypes")
+        if index and not uselength:
+            raise ValueError("Specified uselength=False and index at the same"
+                             " time, these are mutually exclusive options")
+
+        if index:
+            lookup = np.array([*range(len(self.alt_alleles) + 1), -2, -1])
+        elif uselength:
+            lookup = self._allele_lengths
+        else:
+            if self.HasFabricatedAltAlleles():
+                warnings.warn("String genotypes have been requested for a"
+                              " TRRecord generated by a caller which only "
+                              "generates length genotypes, not string genotypes"
+                              ". Returning a fabricated string genotype. Consider"
+                              " requesting length based genotypes instead.")
+            if fullgenotypes:
+                lookup = self._full_allele_strings
+            else:
+                lookup = self._allele_strings
+
+        key = (uselength, index, fullgenotypes)
+        if key not in self._allele_codes:
+            alleles, codes = np.unique(lookup[:-2], return_inverse=True)
+            self._allele_codes[key] = (
+                np.concatenate((codes, [-2, -1])),
+                np.concatenate((alleles, lookup[-2:]))
+            )
+        return self._allele_codes[key]
+
     def GetGenotypeCounts(
             self,
             sample_index: Optional[Any] = None,
@@ -1230,50 +1362,27 @@ class TRRecord:
             and fullgenotypes optional parameters.
         """
         # TODO test these
-        if uselength and fullgenotypes:
-            raise ValueError("Can't specify both uselength and fullgenotypes")
-        if index and not uselength:
-            raise ValueError("Specified uselength=False and index at the same"
-                             " time, these are mutually exclusive options")
+        codes, alleles = self._GetAlleleCodes(uselength, index, fullgenotypes)
 
-        if index:
-            gts = self.GetGenotypeIndicies()
-            nocall_entry = -1
-        elif uselength and not index:
-            gts = self.GetLengthGenotypes()
-            nocall_entry = -1
-        elif not uselength and not fullgenotypes:
-            gts = self.GetStringGenotypes()
-            nocall_entry = '.'
-        elif fullgenotypes:
-            gts = self.GetFullStringGenotypes()
-            nocall_entry = '.'
-
-        if gts is None:
+        idx_gts = self._GetGenotypeIndexArray()
+        if idx_gts is None:
             return {}
 
-        gts = gts[:, :-1]  # remove phasing
-        gts = np.sort(gts, axis=1)
-
+        idx_gts = idx_gts[:, :-1]  # remove phasing
+        called_samples = self._GetCalledSampleMask(True)
         if sample_index is not None:
-            gts = gts[sample_index, :]
-
-        genotypes, counts = np.unique(
-            gts,
-            axis=0,
-            return_counts=True
-        )
-        count_dict = dict(zip(tuple(map(tuple, genotypes)), counts))
-
+            idx_gts = idx_gts[sample_index, :]
+            called_samples = called_samples[sample_index]
         if not include_nocalls:
-            gts_to_remove = set()
-            for genotype in count_dict:
-                if nocall_entry in genotype:
-                    gts_to_remove.add(genotype)
-            for gt in gts_to_remove:
-                del count_dict[gt]
+            idx_gts = idx_gts[called_samples, :]
 
-        return count_dict
+        # count genotypes as allele codes, and only then convert
+        # the (few) distinct genotypes to the requested representation
+        genotypes, counts = _CountGenotypeRows(
+            np.sort(codes[idx_gts], axis=1),
+            alleles.shape[0] - 2
+        )
+        return dict(zip(map(tuple, alleles[genotypes]), counts))
 
     def GetAlleleCounts(self,
                         sample_index: Optional[Any] = None,
@@ -1316,45 +1425,40 @@ class TRRecord:
             and fullgenotypes optional parameters.
         """
         # TODO test these
-        if uselength and fullgenotypes:
-            raise ValueError("Can't specify both uselength and fullgenotypes")
-        if index and not uselength:
-            raise ValueError("Specified uselength=False and index at the same"
-                             " time, these are mutually exclusive options")
-        if index:
-            gts = self.GetGenotypeIndicies()
-            nocall_entry = -1
-            lowploidy_entry = -2
-        elif uselength and not index:
-            gts = self.GetLengthGenotypes()
-            nocall_entry = -1
-            lowploidy_entry = -2
-        elif not uselength and not fullgenotypes:
-            gts = self.GetStringGenotypes()
-            nocall_entry = '.'
-            lowploidy_entry = ','
-        elif fullgenotypes:
-            gts = self.GetFullStringGenotypes()
-            nocall_entry = '.'
-            lowploidy_entry = ','
-
-        if gts is None:
+        codes, alleles = self._GetAlleleCodes(uselength, index, fullgenotypes)
+
+        # callers often ask for the counts (or freqs) of the same
+        # samples several times per record, so remember them.
+        # Return copies as callers may modify the returned dict
+        cache_key = _SampleIndexCacheKey(sample_index)
+        if cache_key is not None:
+            cache_key = (uselength, index, fullgenotypes, cache_key)
+            if cache_key not in self._allele_counts_cache:
+                self._allele_counts_cache[cache_key] = \
+                    self._CountAlleles(sample_index, codes, alleles)
+            return dict(self._allele_counts_cache[cache_key])
+        return self._CountAlleles(sample_index, codes, alleles)
+
+    def _CountAlleles(
+            self,
+            sample_index: Optional[Any],
+            codes: np.ndarray,
+            alleles: np.ndarray) -> Dict[Any, int]:
+        # Implementation of GetAlleleCounts, see there
+        idx_gts = self._GetGenotypeIndexArray()
+        if idx_gts is None:
             return {}
 
-        gts = gts[:, :-1]  # remove phasing
-
+        idx_gts = idx_gts[:, :-1]  # remove phasing
         if sample_index is not None:
-            gts = gts[sample_index, :]
+            idx_gts = idx_gts[sample_index, :]
 
-        # remove no calls and missing haplotypes
-        gts = gts[gts != nocall_entry]
-        gts = gts[gts != lowploidy_entry]
+        # remove no calls (-1) and missing haplotypes (-2)
+        idx_gts = idx_gts[idx_gts >= 0]
 
-        alleles, counts = np.unique(
-            gts,
-            return_counts=True
-        )
-        return dict(zip(alleles, counts))
+        counts = np.bincount(codes[idx_gts])
+        called = np.nonzero(counts)[0]
+        return dict(zip(alleles[called], counts[called]))
 
     def GetAlleleFreqs(self,
                        sample_index: Optional[Any] = None,
@@ -3,6 +3,7 @@ Util functions for calculating summary STR statistics
 and performing basic string operations on STR alleles.
 """
 import argparse
+import collections
 import itertools
 import math
 import os
@@ -478,20 +479,17 @@ def InferRepeatSequence(seq, period):
     best_kmer = None
     best_copies = 0
     for offset in range(0, period):
-        kmers = {}
+        kmers = collections.Counter()
         start_idx = 0
         while start_idx + period <= len(seq):
             kmer = seq[start_idx:(start_idx + period)]
-            if kmer not in kmers:
-                kmers[kmer] = 1
-            else:
-                kmers[kmer] += 1
+            kmers[kmer] += 1
             start_idx += period
-            current_best_kmer = max(kmers, key = lambda k: kmers[k])
-            current_best_copies = kmers[current_best_kmer]
-            if current_best_copies > best_copies:
-                best_kmer = current_best_kmer
-                best_copies = current_best_copies
+            # no other kmer can have more than best_copies copies,
+            # so only the kmer just counted can become the new best
+            if kmers[kmer] > best_copies:
+                best_kmer = kmer
+                best_copies = kmers[kmer]
     return GetCanonicalOneStrand(best_kmer)
 
 def LongestPerfectRepeat(seq, motif, check_reverse=True):